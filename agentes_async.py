@@ -0,0 +1,69 @@
+from playwright.async_api import async_playwright
+import asyncio
+import os
+
+from teste_agentes import (
+    PoolDePaginas, SELETOR_NIVEL_ALVO,
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+    _executar_agente_com_pool, _executar_agente_isolado, _trabalhos_da_lista,
+    _criar_pasta_da_execucao, _imprimir_resumo_da_execucao, _resultado_de_falha, _opcoes_navegador_para,
+    _opcoes_agente_do_ambiente,
+)
+from espelho_cargobot import espelho_do_ambiente
+
+# Execução concorrente num único event loop e num único navegador. Os agentes são os mesmos do
+# teste_agentes.py: recebendo uma página da API async, cada passo do BaseAgent aguarda o Playwright
+# em vez de bloquear, então dezenas de personas avançam juntas sem threads.
+
+async def _executar_agente_concorrente(browser, pool, AgenteClasse, log_folder, limite_concorrencia, opcoes_agente, espelho):
+    async with limite_concorrencia: # Com pool, o limite é o tamanho dele: nunca falta página livre
+        print(f"\n\n--- INICIANDO TESTE COM AGENTE TIPO: {AgenteClasse.__name__} ---")
+        try:
+            if pool is not None: return await _executar_agente_com_pool(pool, AgenteClasse, log_folder, opcoes_agente)
+            return await _executar_agente_isolado(browser, AgenteClasse, log_folder, opcoes_agente, espelho)
+        except Exception as e_agente:
+            print(f"!!! FALHA AO EXECUTAR {AgenteClasse.__name__}: {e_agente}")
+            return _resultado_de_falha(AgenteClasse, e_agente)
+        finally:
+            print(f"--- TESTE COM AGENTE {AgenteClasse.__name__} CONCLUÍDO ---")
+
+async def rodar_agentes_async(lista_de_agentes_classes, log_folder, max_concorrentes=8, opcoes_agente=None, espelho=None, usar_pool=False, ao_concluir=None):
+    # Itens (AgenteClasse, opcoes) dão opções próprias a cada agente: várias sementes da mesma persona dividem o navegador.
+    # ao_concluir(indice, metricas) é chamado assim que cada agente termina (indice na lista), sem esperar os outros
+    opcoes_agente = opcoes_agente or {}
+    trabalhos = _trabalhos_da_lista(lista_de_agentes_classes, log_folder, opcoes_agente)
+    max_concorrentes = min(max_concorrentes, len(trabalhos)) or 1
+    limite_concorrencia = asyncio.Semaphore(max_concorrentes)
+
+    async def executar_e_avisar(indice, AgenteClasse, pasta, opcoes):
+        metricas = await _executar_agente_concorrente(browser, pool, AgenteClasse, pasta, limite_concorrencia, opcoes, espelho)
+        if ao_concluir is not None: ao_concluir(indice, metricas)
+        return metricas
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(**_opcoes_navegador_para(opcoes_agente))
+        pool = PoolDePaginas(browser, espelho=espelho, seletor_nivel=opcoes_agente.get("seletor_nivel", SELETOR_NIVEL_ALVO)) if usar_pool else None
+        if pool is not None: await pool.abastecer(max_concorrentes)
+        all_results_summary = await asyncio.gather(*[executar_e_avisar(indice, AgenteClasse, pasta, opcoes)
+                                                     for indice, (AgenteClasse, pasta, opcoes) in enumerate(trabalhos)])
+        await browser.close()
+    return list(all_results_summary)
+
+def rodar_agentes_para_usabilidade_async(lista_de_agentes_classes, max_concorrentes=8, opcoes_agente=None, espelho=None, usar_pool=False):
+    current_execution_log_folder = _criar_pasta_da_execucao()
+    all_results_summary = asyncio.run(rodar_agentes_async(lista_de_agentes_classes, current_execution_log_folder, max_concorrentes, opcoes_agente, espelho, usar_pool))
+    _imprimir_resumo_da_execucao(all_results_summary, current_execution_log_folder)
+
+if __name__ == "__main__":
+    agentes_a_testar = [
+        AgenteSolucionadorPerfeito,
+        AgenteInicianteExplorador,
+        AgenteImpulsivoAleatorio,
+        AgenteMetodicoF1,
+        AgenteConfusoComChamadas,
+        AgenteSuperOtimista,
+    ]
+    rodar_agentes_para_usabilidade_async(agentes_a_testar, max_concorrentes=int(os.environ.get("AGENTES_CONCORRENTES", "8")),
+                                         opcoes_agente=_opcoes_agente_do_ambiente(), espelho=espelho_do_ambiente(),
+                                         usar_pool=os.environ.get("AGENTES_POOL") == "1")
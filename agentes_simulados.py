@@ -0,0 +1,119 @@
+import os
+
+from simulador_cargobot import SimuladorCargoBot, DESFECHO_TEMPO_ESGOTADO
+from teste_agentes import (
+    BaseAgent, SELETOR_NIVEL_ALVO, COMANDO_POR_SELETOR_PALETA, REGISTRO_SLOT_POR_SELETOR,
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+    _criar_pasta_da_execucao, _imprimir_resumo_da_execucao, _resultado_de_falha, _opcoes_agente_do_ambiente, _trabalhos_da_lista,
+)
+
+# Backend offline do BaseAgent: 'page' é um SimuladorCargoBot em vez de uma página do Chromium.
+# A lógica das personas e as métricas são as mesmas; cada execução do programa leva microssegundos.
+class BaseAgentSimulado(BaseAgent):
+    BACKEND = "simulado"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas_gerais["total_passos_simulacao"] = 0 # Passos da garra somados em todas as execuções simuladas
+
+    async def _pensar(self, segundos_base=1):
+        # Sem navegador não há o que esperar: o tempo de pensar sempre vai só para o relógio virtual
+        duracao = self._sortear_tempo_pensar(segundos_base)
+        self.medidor.registrar_pensar(duracao, dormido=False)
+        self.tempo_virtual_acumulado_s += duracao
+
+    async def arrastar_para_slot(self, seletor_comando_paleta, seletor_slot_destino, nome_comando_log="Comando", func_slot_info=None):
+        self._log(f"Tentando arrastar '{nome_comando_log}' ({seletor_comando_paleta}) para slot '{seletor_slot_destino}'", seletor=seletor_slot_destino, operacao="drag_to")
+        try:
+            if seletor_comando_paleta not in COMANDO_POR_SELETOR_PALETA: raise ValueError(f"Comando desconhecido na paleta: {seletor_comando_paleta}")
+            if seletor_slot_destino not in REGISTRO_SLOT_POR_SELETOR: raise ValueError(f"Slot desconhecido: {seletor_slot_destino}")
+            registro, indice = REGISTRO_SLOT_POR_SELETOR[seletor_slot_destino]
+            self.page.colocar(registro, indice, COMANDO_POR_SELETOR_PALETA[seletor_comando_paleta])
+            self._contabilizar_comando_colocado(func_slot_info, seletor_comando_paleta, seletor_slot_destino)
+            self._log(f"SUCESSO: '{nome_comando_log}' arrastado para '{seletor_slot_destino}'.", seletor=seletor_slot_destino, operacao="drag_to")
+        except Exception as e:
+            self._log(f"ERRO AO ARRASTAR '{nome_comando_log}' para '{seletor_slot_destino}': {e}", tipo="SCRIPT_ERROR", seletor=seletor_slot_destino, operacao="drag_to")
+            self.metricas_gerais["erros_de_script"] += 1
+            raise
+        await self._pensar(0.1 * self.slow_mo_factor)
+
+    async def _carregar_programa_em_lote(self, comandos):
+        # No simulador cada arraste já é instantâneo: a carga rápida coloca os comandos direto nos registros
+        self._log(f"Carga rápida: colocando {len(comandos)} comandos de uma vez...", operacao="carga_rapida")
+        for seletor_paleta, seletor_slot, nome_log, func_slot_info in comandos:
+            registro, indice = REGISTRO_SLOT_POR_SELETOR[seletor_slot]
+            self.page.colocar(registro, indice, COMANDO_POR_SELETOR_PALETA[seletor_paleta])
+            self._contabilizar_comando_colocado(func_slot_info, seletor_paleta, seletor_slot)
+        self._log(f"SUCESSO: {len(comandos)} comandos colocados na carga rápida.", operacao="carga_rapida")
+        for _ in comandos: await self._pensar(0.1 * self.slow_mo_factor) # Aqui o pensar sempre vai para o relógio virtual
+
+    async def clicar_play_jogo(self):
+        if self._consultar_cache_no_play(): return
+        self._log("Clicando no Play do Jogo...", operacao="clique_play")
+        self.page.executar()
+        self.metricas_gerais["total_cliques_play"] += 1
+        self.metricas_tentativa["cliques_play_nesta_tentativa"] += 1
+        self._log("Play do Jogo clicado.", operacao="clique_play")
+
+    async def clicar_clear_jogo(self):
+        self._log("Clicando no Clear do Jogo...", operacao="clear")
+        self.page.limpar_registros()
+        self.page.reiniciar_tabuleiro()
+        self.metricas_gerais["total_usos_clear"] += 1
+        self._resetar_metricas_tentativa()
+        await self._pensar(0.3)
+
+    async def navegar_para_nivel(self):
+        self._log(f"Carregando o nível {self.seletor_nivel} no simulador...", operacao="navegacao")
+        self.page.carregar_nivel(self.seletor_nivel)
+        for segundos_base in (1.5, 0.3, 0.3, 2.5): await self._pensar(segundos_base) # Mesmas pausas da navegação real
+        self._log(f"Nível '{self.seletor_nivel}' ({self.page.nivel['nome']}) carregado no simulador.", operacao="navegacao")
+
+    async def _verificar_sucesso_nivel(self, tempo_execucao_jogo=5):
+        resolvido_pelo_cache = self._desfecho_do_cache_pendente()
+        if resolvido_pelo_cache is not None: return resolvido_pelo_cache
+        self._log(f"Observando execução simulada (até {tempo_execucao_jogo}s) para verificar sucesso...", operacao="verificacao")
+        inicio_observacao = self._agora()
+        resultado, self.page.ultimo_resultado = self.page.ultimo_resultado, None
+        if resultado is None: resultado = {"desfecho": DESFECHO_TEMPO_ESGOTADO, "passos": 0} # Play não foi clicado
+        self.metricas_tentativa["passos_simulacao"] = resultado["passos"]
+        self.metricas_gerais["total_passos_simulacao"] += resultado["passos"]
+        self._log(f"Simulação terminou em {resultado['passos']} passos.", operacao="verificacao")
+        return self._registrar_desfecho(resultado["desfecho"], inicio_observacao)
+
+def versao_simulada(AgenteClasse):
+    """Gera a variante de uma persona que roda no simulador offline, com a mesma lógica de tentativa."""
+    if issubclass(AgenteClasse, BaseAgentSimulado): return AgenteClasse
+    return type(f"{AgenteClasse.__name__}Simulado", (BaseAgentSimulado, AgenteClasse), {"__module__": __name__})
+
+def rodar_agentes_simulados(lista_de_agentes_classes, log_folder, nivel_id=SELETOR_NIVEL_ALVO, opcoes_agente=None, ao_concluir=None):
+    # ao_concluir(indice, metricas): mesmo aviso por agente do rodar_agentes_async
+    all_results_summary = []
+    for indice, (AgenteClasse, pasta, opcoes) in enumerate(_trabalhos_da_lista(lista_de_agentes_classes, log_folder, opcoes_agente or {})):
+        try:
+            agente = versao_simulada(AgenteClasse)(SimuladorCargoBot(nivel_id), log_folder=pasta, seletor_nivel=nivel_id, **opcoes)
+            agente.run()
+            all_results_summary.append(agente.metricas_gerais)
+        except Exception as e_agente:
+            print(f"!!! FALHA AO EXECUTAR {AgenteClasse.__name__}: {e_agente}")
+            all_results_summary.append(_resultado_de_falha(AgenteClasse, e_agente))
+        if ao_concluir is not None: ao_concluir(indice, all_results_summary[-1])
+    return all_results_summary
+
+def rodar_agentes_para_usabilidade_simulados(lista_de_agentes_classes, nivel_id=SELETOR_NIVEL_ALVO, opcoes_agente=None):
+    current_execution_log_folder = _criar_pasta_da_execucao()
+    all_results_summary = rodar_agentes_simulados(lista_de_agentes_classes, current_execution_log_folder, nivel_id, opcoes_agente)
+    _imprimir_resumo_da_execucao(all_results_summary, current_execution_log_folder)
+
+if __name__ == "__main__":
+    agentes_a_testar = [
+        AgenteSolucionadorPerfeito,
+        AgenteInicianteExplorador,
+        AgenteImpulsivoAleatorio,
+        AgenteMetodicoF1,
+        AgenteConfusoComChamadas,
+        AgenteSuperOtimista,
+    ]
+    rodar_agentes_para_usabilidade_simulados(agentes_a_testar, nivel_id=os.environ.get("AGENTES_NIVEL", SELETOR_NIVEL_ALVO),
+                                             opcoes_agente=_opcoes_agente_do_ambiente())
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try: import resource # Pico de memória (ru_maxrss); não existe no Windows
+except ImportError: resource = None
+
+from jogo_local import JogoLocal
+from latencias import somar_latencias
+from registro_eventos import VERBOSIDADE_SILENCIOSO
+from teste_agentes import (
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+    rodar_agentes, _criar_pasta_da_execucao,
+)
+
+# Benchmark do harness: as mesmas personas, com as mesmas sementes, contra o JogoLocal (sem rede),
+# em cada modo de execução. Cada modo roda num processo novo para que o pico de memória seja só dele.
+# O resultado é um JSON que serve de baseline para comparar execuções futuras.
+
+PERSONAS_BENCHMARK = [
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+]
+SEMENTE_BENCHMARK = 1234
+WORKERS_PADRAO = 3
+MODOS = { # runner + parâmetros; "workers" vira num_workers/max_concorrentes
+    "sequencial": {"runner": "sync", "paralelo": False, "usar_pool": False},
+    "sequencial_pool": {"runner": "sync", "paralelo": False, "usar_pool": True},
+    "processos": {"runner": "sync", "paralelo": True, "usar_pool": False},
+    "processos_pool": {"runner": "sync", "paralelo": True, "usar_pool": True},
+    "async": {"runner": "async", "paralelo": True, "usar_pool": False},
+    "async_pool": {"runner": "async", "paralelo": True, "usar_pool": True},
+    "fila": {"runner": "fila", "paralelo": True, "usar_pool": False}, # "workers" processos rodar_worker numa fila SQLite
+    "fila_pool": {"runner": "fila", "paralelo": True, "usar_pool": True},
+    "simulado": {"runner": "simulado", "paralelo": False, "usar_pool": False}, # Referência sem navegador
+}
+# Métrica -> sentido bom (+1 maior é melhor, -1 menor é melhor)
+METRICAS_COMPARADAS = {
+    "agentes_por_min": +1, "tentativas_por_s": +1, "drag_medio_ms": -1, "navegacao_media_s": -1,
+    "rss_pico_processo_mb": -1, "rss_pico_filhos_mb": -1,
+}
+TOLERANCIA_PADRAO = 0.10 # Piora acima de 10% conta como regressão
+
+def _rss_mb(quem):
+    if resource is None: return None
+    pico = resource.getrusage(quem).ru_maxrss
+    return round(pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024, 1) # bytes no macOS, KB no Linux
+
+def _media_ms(histogramas, operacao, escala=1000):
+    h = histogramas.get(operacao)
+    return round(escala * h.total_s / h.n, 3 if escala == 1 else 1) if h and h.n else None
+
+def _rodar_pela_fila(pasta, workers, opcoes_agente, jogo, usar_pool):
+    # Enfileira as personas fixas com a semente da repetição e sobe 'workers' processos rodar_worker até a fila esvaziar
+    from fila_trabalhos import FilaDeTrabalhos, rodar_worker, ESTADO_FALHOU
+    caminho_fila, varredura = os.path.join(pasta, "fila.sqlite"), "benchmark"
+    fila = FilaDeTrabalhos(caminho_fila)
+    try: fila.enfileirar(varredura, [p.__name__ for p in PERSONAS_BENCHMARK], [opcoes_agente["semente"]], backend="navegador")
+    finally: fila.fechar()
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=rodar_worker, args=(caminho_fila, pasta, varredura),
+                                  kwargs={"opcoes_agente": opcoes_agente, "espelho": jogo, "usar_pool": usar_pool}) for _ in range(workers)]
+    for processo in processos: processo.start()
+    for processo in processos: processo.join()
+    fila = FilaDeTrabalhos(caminho_fila)
+    try: # Trabalhos que esgotaram as tentativas contam como agentes com erro, como _resultado_de_falha nos outros modos
+        return fila.resultados(varredura) + [{"erro_execucao": "falhou na fila"}] * fila.contagem_por_estado(varredura)[ESTADO_FALHOU]
+    finally: fila.fechar()
+
+def _executar_modo(nome_modo, repeticoes, workers, pasta_logs):
+    configuracao = MODOS[nome_modo]
+    os.environ["AGENTES_HEADLESS"] = "1" # Herdado pelos workers dos modos "processos" e "fila"
+    jogo = JogoLocal()
+    resultados, inicio = [], time.perf_counter()
+    for repeticao in range(repeticoes): # Uma chamada ao runner por repetição: pastas e sementes próprias, sem colisão de logs
+        pasta = os.path.join(pasta_logs, nome_modo, f"repeticao_{repeticao}")
+        os.makedirs(pasta, exist_ok=True)
+        opcoes_agente = {"semente": SEMENTE_BENCHMARK + repeticao, "relogio_virtual": True, "medir_latencias": True,
+                         "verbosidade_console": VERBOSIDADE_SILENCIOSO}
+        if configuracao["runner"] == "simulado":
+            from agentes_simulados import rodar_agentes_simulados
+            resultados += rodar_agentes_simulados(PERSONAS_BENCHMARK, pasta, opcoes_agente=opcoes_agente)
+        elif configuracao["runner"] == "async":
+            from agentes_async import rodar_agentes_async
+            resultados += asyncio.run(rodar_agentes_async(PERSONAS_BENCHMARK, pasta, workers, opcoes_agente, jogo, configuracao["usar_pool"]))
+        elif configuracao["runner"] == "fila":
+            resultados += _rodar_pela_fila(pasta, workers, opcoes_agente, jogo, configuracao["usar_pool"])
+        else:
+            resultados += rodar_agentes(PERSONAS_BENCHMARK, pasta, workers if configuracao["paralelo"] else 1, opcoes_agente, jogo, configuracao["usar_pool"])
+    tempo_parede_s = time.perf_counter() - inicio
+    histogramas = somar_latencias([r.get("latencias") for r in resultados])
+    tentativas = sum(r.get("total_tentativas_feitas") or 0 for r in resultados)
+    return {
+        "agentes": len(resultados), "agentes_com_erro": sum("erro_execucao" in r for r in resultados),
+        "tempo_parede_s": round(tempo_parede_s, 2),
+        "agentes_por_min": round(60 * len(resultados) / tempo_parede_s, 2),
+        "tentativas_por_s": round(tentativas / tempo_parede_s, 3),
+        "drag_medio_ms": _media_ms(histogramas, "drag_to"),
+        "navegacao_media_s": _media_ms(histogramas, "navegacao", escala=1), # None nos modos com pool: não há navegação por agente
+        "verificacao_media_s": _media_ms(histogramas, "verificacao", escala=1),
+        "rss_pico_processo_mb": _rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "rss_pico_filhos_mb": _rss_mb(resource.RUSAGE_CHILDREN) if resource else None, # Maior worker/Chromium já encerrado
+    }
+
+def _alvo_do_processo(conexao, nome_modo, repeticoes, workers, pasta_logs):
+    try: conexao.send(("ok", _executar_modo(nome_modo, repeticoes, workers, pasta_logs)))
+    except Exception as e_modo: conexao.send(("erro", repr(e_modo)))
+    finally: conexao.close()
+
+def medir_modo(nome_modo, repeticoes=1, workers=WORKERS_PADRAO, pasta_logs="benchmark_logs"):
+    contexto = multiprocessing.get_context("spawn") # Processo limpo: memória e Chromiums só deste modo
+    recebe, envia = contexto.Pipe(duplex=False)
+    processo = contexto.Process(target=_alvo_do_processo, args=(envia, nome_modo, repeticoes, workers, pasta_logs))
+    processo.start()
+    envia.close()
+    try: estado, valor = recebe.recv()
+    except EOFError: estado, valor = "erro", f"processo do modo terminou com código {processo.exitcode}"
+    processo.join()
+    if estado == "erro": return {"erro": valor}
+    return valor
+
+def _ambiente():
+    ambiente = {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(),
+                "data": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with contextlib.suppress(Exception):
+        from importlib.metadata import version
+        ambiente["playwright"] = version("playwright")
+    with contextlib.suppress(Exception):
+        ambiente["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                          cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    return ambiente
+
+def rodar_benchmark(modos, repeticoes=1, workers=WORKERS_PADRAO):
+    pasta_logs = _criar_pasta_da_execucao("benchmark_logs")
+    resultado = {"ambiente": _ambiente(), "parametros": {"repeticoes": repeticoes, "workers": workers, "semente": SEMENTE_BENCHMARK,
+                                                         "personas": [p.__name__ for p in PERSONAS_BENCHMARK]}, "modos": {}}
+    for nome_modo in modos:
+        print(f"\n--- BENCHMARK: modo '{nome_modo}' ---")
+        resultado["modos"][nome_modo] = medir_modo(nome_modo, repeticoes, workers, pasta_logs)
+        print(json.dumps(resultado["modos"][nome_modo], indent=2))
+    return resultado
+
+def comparar_com_baseline(atual, baseline, tolerancia=TOLERANCIA_PADRAO):
+    # Imprime a variação de cada métrica e devolve as regressões como (modo, métrica, variação)
+    regressoes = []
+    print(f"\n--- COMPARAÇÃO COM A BASELINE ({baseline['ambiente'].get('data')}, commit {baseline['ambiente'].get('commit', '?')}) ---")
+    for nome_modo, metricas in atual["modos"].items():
+        base = baseline["modos"].get(nome_modo)
+        if not base or "erro" in base or "erro" in metricas: continue
+        print(f"\n{nome_modo}:")
+        for metrica, sentido in METRICAS_COMPARADAS.items():
+            valor, valor_base = metricas.get(metrica), base.get(metrica)
+            if valor is None or not valor_base: continue
+            variacao = (valor - valor_base) / valor_base
+            piorou = sentido * variacao < -tolerancia
+            if piorou: regressoes.append((nome_modo, metrica, variacao))
+            print(f"  {metrica:<22}{valor_base:>10} -> {valor:<10}{variacao:+8.1%}{'  REGRESSÃO' if piorou else ''}")
+    print(f"\n{len(regressoes)} regressões acima de {tolerancia:.0%}.")
+    return regressoes
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark do harness de agentes contra o jogo local (sem rede).")
+    parser.add_argument("--modos", default=",".join(MODOS), help="Modos separados por vírgula: " + ", ".join(MODOS))
+    parser.add_argument("--repeticoes", type=int, default=1, help="Quantas vezes o conjunto de personas roda em cada modo")
+    parser.add_argument("--workers", type=int, default=WORKERS_PADRAO, help="Processos ou agentes concorrentes nos modos paralelos")
+    parser.add_argument("--salvar", help="Arquivo JSON do resultado (padrão: benchmarks/benchmark_<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior usado como baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO)
+    args = parser.parse_args(argumentos)
+
+    modos = args.modos.split(",")
+    for nome_modo in modos:
+        if nome_modo not in MODOS: parser.error(f"modo desconhecido: {nome_modo}")
+    resultado = rodar_benchmark(modos, args.repeticoes, args.workers)
+    caminho = args.salvar or os.path.join("benchmarks", f"benchmark_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f: json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em: {caminho}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f: baseline = json.load(f)
+        if comparar_com_baseline(resultado, baseline, args.tolerancia): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import sqlite3
+import time
+
+# Cache persistente de desfechos: um programa F1..F4 já executado num nível sempre dá o mesmo resultado,
+# então o agente pode pular o Play e a espera da verificação. SQLite para ser compartilhado entre
+# execuções e entre workers; quando passa de max_entradas, saem os programas usados há mais tempo.
+
+MAX_ENTRADAS_PADRAO = 10000
+DESFECHOS_CACHEAVEIS = ("sucesso", "falha", "terminou_sem_sucesso") # "tempo_esgotado" depende do limite de cada persona
+
+def chave_do_programa(backend, nivel_id, programa_canonico):
+    # programa_canonico: {"f1": [cmd ou None, ...], ...}; slots vazios não contam, como no jogo.
+    # O backend faz parte da chave: o simulador usa um layout próprio dos níveis e desfechos de 0s, que não
+    # podem responder por uma execução no navegador (e vice-versa) quando o arquivo do cache é o mesmo
+    registros = ";".join(f"{registro}:{','.join(cmd for cmd in slots if cmd)}" for registro, slots in sorted(programa_canonico.items()))
+    return f"{backend}|{nivel_id}|{registros}"
+
+class CacheDeDesfechos:
+    def __init__(self, caminho, max_entradas=MAX_ENTRADAS_PADRAO):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self._conexao = None # Aberta no primeiro uso: o objeto pode ser criado num processo e usado em outro
+
+    def _conectar(self):
+        if self._conexao is None:
+            # Sem check_same_thread: o objeto é criado numa thread e pode ser usado em outra (sempre um uso por vez)
+            self._conexao = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("""CREATE TABLE IF NOT EXISTS desfechos (
+                chave TEXT PRIMARY KEY, nivel TEXT NOT NULL, desfecho TEXT NOT NULL,
+                tempo_execucao_s REAL NOT NULL, acessado_em REAL NOT NULL, acertos INTEGER NOT NULL DEFAULT 0)""")
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_desfechos_acessado_em ON desfechos (acessado_em)")
+        return self._conexao
+
+    def consultar(self, chave):
+        conexao = self._conectar()
+        linha = conexao.execute("SELECT desfecho, tempo_execucao_s FROM desfechos WHERE chave = ?", (chave,)).fetchone()
+        if linha is None: return None
+        conexao.execute("UPDATE desfechos SET acessado_em = ?, acertos = acertos + 1 WHERE chave = ?", (time.time(), chave))
+        return {"desfecho": linha[0], "tempo_execucao_s": linha[1]}
+
+    def guardar(self, chave, nivel_id, desfecho, tempo_execucao_s):
+        if desfecho not in DESFECHOS_CACHEAVEIS: return
+        conexao = self._conectar()
+        conexao.execute("INSERT OR REPLACE INTO desfechos (chave, nivel, desfecho, tempo_execucao_s, acessado_em) VALUES (?, ?, ?, ?, ?)",
+                        (chave, nivel_id, desfecho, tempo_execucao_s, time.time()))
+        excedente = conexao.execute("SELECT COUNT(*) FROM desfechos").fetchone()[0] - self.max_entradas
+        if excedente > 0:
+            conexao.execute("DELETE FROM desfechos WHERE chave IN (SELECT chave FROM desfechos ORDER BY acessado_em LIMIT ?)", (excedente,))
+
+    def fechar(self):
+        if self._conexao is not None: self._conexao.close(); self._conexao = None
@@ -0,0 +1,120 @@
+from playwright.sync_api import sync_playwright
+from urllib.parse import urlparse
+import hashlib
+import os
+import re
+import sys
+
+from teste_agentes import CARGOBOT_BASE_URL, SELETOR_START_THE_GAME, SELETOR_PACOTE_EASY, SELETOR_NIVEL_ALVO
+
+# Espelho local do site do CargoBot: cada contexto do navegador intercepta as requisições,
+# serve os arquivos guardados em disco e só vai à rede (uma vez) para o que ainda não tem.
+PASTA_ESPELHO_PADRAO = "cargobot_espelho"
+TIPOS_RECURSO_NAO_ESSENCIAIS = {"media", "font", "beacon", "ping"}
+EXTENSOES_NAO_ESSENCIAIS = (".mp3", ".ogg", ".wav", ".m4a", ".woff", ".woff2", ".ttf", ".otf")
+HOSTS_NAO_ESSENCIAIS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "fonts.googleapis.com", "fonts.gstatic.com",
+)
+EXTENSOES_TEXTO = (".html", ".htm", ".js", ".json", ".css", ".txt")
+# Ponto de partida para achar a mensagem de batida/erro do jogo (teste_agentes.PADRAO_TEXTO_FALHA)
+PADRAO_CANDIDATOS_FALHA = r"crash|oops|fail|error|collid|fell|broke"
+
+def caminho_no_espelho(pasta_espelho, url):
+    partes = urlparse(url)
+    caminho = partes.path or "/"
+    if caminho.endswith("/"): caminho += "index.html"
+    if partes.query: # Mesma URL com querystring diferente vira outro arquivo
+        raiz, extensao = os.path.splitext(caminho)
+        caminho = f"{raiz}.{hashlib.sha1(partes.query.encode()).hexdigest()[:12]}{extensao}"
+    return os.path.join(pasta_espelho, partes.netloc, caminho.lstrip("/"))
+
+def recurso_nao_essencial(request):
+    partes = urlparse(request.url)
+    if request.resource_type in TIPOS_RECURSO_NAO_ESSENCIAIS: return True
+    if partes.path.lower().endswith(EXTENSOES_NAO_ESSENCIAIS): return True
+    return any(partes.netloc == host or partes.netloc.endswith("." + host) for host in HOSTS_NAO_ESSENCIAIS)
+
+class EspelhoCargoBot:
+    def __init__(self, pasta_espelho=PASTA_ESPELHO_PADRAO, bloquear_nao_essenciais=True, somente_offline=False):
+        self.pasta_espelho = pasta_espelho
+        self.bloquear_nao_essenciais = bloquear_nao_essenciais
+        self.somente_offline = somente_offline # CI sem rede: o que não está no espelho é abortado
+
+    def _decidir(self, request):
+        # Devolve ("bloquear" | "servir" | "baixar" | "seguir", caminho no espelho)
+        if self.bloquear_nao_essenciais and recurso_nao_essencial(request): return "bloquear", None
+        if request.method != "GET": return ("bloquear" if self.somente_offline else "seguir"), None
+        caminho = caminho_no_espelho(self.pasta_espelho, request.url)
+        if os.path.isfile(caminho): return "servir", caminho
+        return ("bloquear" if self.somente_offline else "baixar"), caminho
+
+    def _guardar(self, caminho, corpo):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        caminho_temporario = f"{caminho}.{os.getpid()}.tmp" # Vários workers podem baixar o mesmo arquivo
+        with open(caminho_temporario, "wb") as f: f.write(corpo)
+        os.replace(caminho_temporario, caminho)
+
+    def tratar_rota(self, route):
+        acao, caminho = self._decidir(route.request)
+        if acao == "bloquear": route.abort("blockedbyclient")
+        elif acao == "servir": route.fulfill(path=caminho)
+        elif acao == "seguir": route.continue_()
+        else:
+            resposta = route.fetch()
+            if resposta.ok: self._guardar(caminho, resposta.body())
+            route.fulfill(response=resposta)
+
+    async def tratar_rota_async(self, route):
+        acao, caminho = self._decidir(route.request)
+        if acao == "bloquear": await route.abort("blockedbyclient")
+        elif acao == "servir": await route.fulfill(path=caminho)
+        elif acao == "seguir": await route.continue_()
+        else:
+            resposta = await route.fetch()
+            if resposta.ok: self._guardar(caminho, await resposta.body())
+            await route.fulfill(response=resposta)
+
+    def instalar(self, contexto):
+        contexto.route("**/*", self.tratar_rota)
+
+    async def instalar_async(self, contexto):
+        await contexto.route("**/*", self.tratar_rota_async)
+
+def espelho_do_ambiente():
+    # AGENTES_ESPELHO=<pasta> liga o espelho; AGENTES_OFFLINE=1 proíbe qualquer acesso à rede
+    pasta_espelho = os.environ.get("AGENTES_ESPELHO")
+    if not pasta_espelho: return None
+    return EspelhoCargoBot(pasta_espelho, somente_offline=os.environ.get("AGENTES_OFFLINE") == "1")
+
+def procurar_no_espelho(pasta_espelho, padrao=PADRAO_CANDIDATOS_FALHA, contexto=60):
+    # Trechos dos arquivos de texto já espelhados que casam com o padrão: (caminho, trecho)
+    regex = re.compile(padrao, re.IGNORECASE)
+    for raiz, _, arquivos in os.walk(pasta_espelho):
+        for nome in sorted(arquivos):
+            if not nome.lower().endswith(EXTENSOES_TEXTO): continue
+            caminho = os.path.join(raiz, nome)
+            with open(caminho, encoding="utf-8", errors="replace") as f: texto = f.read()
+            for achado in regex.finditer(texto):
+                yield caminho, " ".join(texto[max(0, achado.start() - contexto):achado.end() + contexto].split())
+
+def popular_espelho(espelho):
+    # Percorre uma vez o caminho das personas (start -> pacote -> nível) com rede, gravando tudo no espelho
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        contexto = browser.new_context()
+        espelho.instalar(contexto)
+        page = contexto.new_page()
+        page.goto(CARGOBOT_BASE_URL, timeout=60000, wait_until="load")
+        page.locator(SELETOR_START_THE_GAME).click(timeout=15000)
+        page.locator(SELETOR_PACOTE_EASY).click(timeout=15000)
+        page.locator(SELETOR_NIVEL_ALVO).click(timeout=15000)
+        page.wait_for_load_state("networkidle")
+        browser.close()
+    print(f"Espelho do CargoBot salvo em: {espelho.pasta_espelho}")
+
+if __name__ == "__main__":
+    pasta_espelho = os.environ.get("AGENTES_ESPELHO", PASTA_ESPELHO_PADRAO)
+    if sys.argv[1:2] == ["procurar"]: # python espelho_cargobot.py procurar [regex]: busca no espelho já populado
+        for caminho, trecho in procurar_no_espelho(pasta_espelho, *sys.argv[2:3]): print(f"{caminho}: ...{trecho}...")
+    else: popular_espelho(EspelhoCargoBot(pasta_espelho, bloquear_nao_essenciais=False))
@@ -0,0 +1,255 @@
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from simulador_cargobot import SimuladorCargoBot
+from teste_agentes import (
+    SELETOR_NIVEL_ALVO,
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+    _iniciar_worker_navegador, _executar_agente_no_worker, _encerrar_worker_navegador,
+    _opcoes_navegador_para, _opcoes_agente_do_ambiente, _imprimir_resumo_da_execucao,
+)
+from agentes_simulados import versao_simulada
+import teste_agentes # Globais do navegador do worker, lidos no momento do uso
+from espelho_cargobot import espelho_do_ambiente
+
+# Fila de trabalhos em SQLite para varreduras de personas: o coordenador enfileira (persona, semente, nível)
+# e qualquer número de workers, na mesma máquina ou em outras com o mesmo sistema de arquivos, pega um
+# trabalho por vez com um lease. Worker que morre deixa o lease vencer e o trabalho volta para a fila;
+# reenfileirar a mesma varredura só acrescenta o que falta, então uma varredura interrompida é retomada.
+
+PERSONAS = {AgenteClasse.__name__: AgenteClasse for AgenteClasse in (
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+)}
+BACKENDS = ("simulado", "navegador")
+ESTADO_PENDENTE, ESTADO_EM_EXECUCAO, ESTADO_CONCLUIDO, ESTADO_FALHOU = "pendente", "em_execucao", "concluido", "falhou"
+LEASE_PADRAO_S = 300 # Sem renovação por esse tempo, o trabalho é dado como perdido
+MAX_TENTATIVAS_PADRAO = 3
+INTERVALO_ESPERA_S = 2.0 # Worker ocioso espera isso antes de olhar a fila de novo
+
+class FilaDeTrabalhos:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # Sem WAL: o modo de journal padrão é o que funciona com o arquivo num disco compartilhado entre máquinas
+        self._conexao = sqlite3.connect(caminho, timeout=60, isolation_level=None, check_same_thread=False)
+        self._trava = threading.Lock() # O worker renova o lease de outra thread com a mesma conexão
+        self._conexao.execute("""CREATE TABLE IF NOT EXISTS trabalhos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            varredura TEXT NOT NULL, persona TEXT NOT NULL, semente INTEGER NOT NULL, nivel TEXT NOT NULL,
+            backend TEXT NOT NULL, estado TEXT NOT NULL DEFAULT 'pendente',
+            tentativas INTEGER NOT NULL DEFAULT 0, max_tentativas INTEGER NOT NULL,
+            worker TEXT, lease_ate REAL, metricas TEXT, erro TEXT, atualizado_em REAL,
+            UNIQUE (varredura, persona, semente, nivel))""")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_trabalhos_estado ON trabalhos (varredura, estado)")
+
+    @contextlib.contextmanager
+    def _transacao(self):
+        # BEGIN IMMEDIATE pega a trava de escrita já no início: dois workers nunca pegam o mesmo trabalho
+        with self._trava:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try: yield self._conexao
+            except BaseException: self._conexao.execute("ROLLBACK"); raise
+            else: self._conexao.execute("COMMIT")
+
+    def enfileirar(self, varredura, personas, sementes, nivel_id=SELETOR_NIVEL_ALVO, backend="simulado", max_tentativas=MAX_TENTATIVAS_PADRAO):
+        for persona in personas:
+            if persona not in PERSONAS: raise ValueError(f"Persona desconhecida: {persona}")
+        if backend not in BACKENDS: raise ValueError(f"Backend desconhecido: {backend}")
+        with self._transacao() as conexao:
+            antes = conexao.total_changes
+            conexao.executemany("""INSERT OR IGNORE INTO trabalhos (varredura, persona, semente, nivel, backend, max_tentativas, atualizado_em)
+                                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                                [(varredura, persona, semente, nivel_id, backend, max_tentativas, time.time()) for persona in personas for semente in sementes])
+            return conexao.total_changes - antes # Só os que ainda não existiam
+
+    def reabrir_falhas(self, varredura):
+        with self._transacao() as conexao:
+            return conexao.execute("UPDATE trabalhos SET estado = ?, tentativas = 0, erro = NULL, atualizado_em = ? WHERE varredura = ? AND estado = ?",
+                                   (ESTADO_PENDENTE, time.time(), varredura, ESTADO_FALHOU)).rowcount
+
+    def _recuperar_leases_vencidos(self, conexao, agora):
+        conexao.execute("""UPDATE trabalhos SET estado = CASE WHEN tentativas >= max_tentativas THEN ? ELSE ? END,
+                                  erro = 'lease vencido (worker ' || COALESCE(worker, '?') || ' parou de responder)', worker = NULL, atualizado_em = ?
+                           WHERE estado = ? AND lease_ate < ?""", (ESTADO_FALHOU, ESTADO_PENDENTE, agora, ESTADO_EM_EXECUCAO, agora))
+
+    def pegar(self, worker, varredura=None, lease_s=LEASE_PADRAO_S):
+        agora = time.time()
+        with self._transacao() as conexao:
+            self._recuperar_leases_vencidos(conexao, agora)
+            filtro, parametros = ("AND varredura = ?", (ESTADO_PENDENTE, varredura)) if varredura else ("", (ESTADO_PENDENTE,))
+            linha = conexao.execute(f"SELECT id, varredura, persona, semente, nivel, backend, tentativas FROM trabalhos WHERE estado = ? {filtro} ORDER BY id LIMIT 1",
+                                    parametros).fetchone()
+            if linha is None: return None
+            conexao.execute("UPDATE trabalhos SET estado = ?, worker = ?, lease_ate = ?, tentativas = tentativas + 1, atualizado_em = ? WHERE id = ?",
+                            (ESTADO_EM_EXECUCAO, worker, agora + lease_s, agora, linha[0]))
+        return dict(zip(("id", "varredura", "persona", "semente", "nivel", "backend", "tentativas"), linha), tentativas=linha[6] + 1)
+
+    def renovar(self, id_trabalho, worker, lease_s=LEASE_PADRAO_S):
+        with self._transacao() as conexao:
+            return conexao.execute("UPDATE trabalhos SET lease_ate = ? WHERE id = ? AND worker = ? AND estado = ?",
+                                   (time.time() + lease_s, id_trabalho, worker, ESTADO_EM_EXECUCAO)).rowcount == 1
+
+    def concluir(self, id_trabalho, worker, metricas):
+        with self._transacao() as conexao:
+            conexao.execute("UPDATE trabalhos SET estado = ?, metricas = ?, erro = NULL, lease_ate = NULL, atualizado_em = ? WHERE id = ? AND worker = ?",
+                            (ESTADO_CONCLUIDO, json.dumps(metricas, default=str), time.time(), id_trabalho, worker))
+
+    def registrar_erro(self, id_trabalho, worker, erro):
+        # Volta para a fila enquanto houver tentativas; depois fica como falhou
+        with self._transacao() as conexao:
+            conexao.execute("""UPDATE trabalhos SET estado = CASE WHEN tentativas >= max_tentativas THEN ? ELSE ? END,
+                                      erro = ?, worker = NULL, lease_ate = NULL, atualizado_em = ? WHERE id = ? AND worker = ?""",
+                            (ESTADO_FALHOU, ESTADO_PENDENTE, repr(erro), time.time(), id_trabalho, worker))
+
+    def liberar(self, id_trabalho, worker):
+        # Worker interrompido (Ctrl-C): devolve o trabalho à fila na hora, sem gastar a tentativa nem esperar o lease vencer
+        with self._transacao() as conexao:
+            conexao.execute("""UPDATE trabalhos SET estado = ?, tentativas = tentativas - 1, worker = NULL, lease_ate = NULL, atualizado_em = ?
+                               WHERE id = ? AND worker = ? AND estado = ?""", (ESTADO_PENDENTE, time.time(), id_trabalho, worker, ESTADO_EM_EXECUCAO))
+
+    def contagem_por_estado(self, varredura=None):
+        # Sem varredura: a fila inteira
+        filtro, parametros = ("WHERE varredura = ?", (varredura,)) if varredura else ("", ())
+        linhas = self._conexao.execute(f"SELECT estado, COUNT(*) FROM trabalhos {filtro} GROUP BY estado", parametros).fetchall()
+        return {estado: 0 for estado in (ESTADO_PENDENTE, ESTADO_EM_EXECUCAO, ESTADO_CONCLUIDO, ESTADO_FALHOU)} | dict(linhas)
+
+    def resultados(self, varredura):
+        linhas = self._conexao.execute("SELECT metricas FROM trabalhos WHERE varredura = ? AND estado = ? ORDER BY persona, semente",
+                                       (varredura, ESTADO_CONCLUIDO)).fetchall()
+        return [json.loads(metricas) for (metricas,) in linhas]
+
+    def fechar(self):
+        self._conexao.close()
+
+class _RenovadorDeLease:
+    # Thread que renova o lease enquanto o agente roda; se o worker morrer, a renovação para junto
+    def __init__(self, fila, id_trabalho, worker, lease_s):
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._renovar, args=(fila, id_trabalho, worker, lease_s), daemon=True)
+
+    def _renovar(self, fila, id_trabalho, worker, lease_s):
+        while not self._parar.wait(lease_s / 3):
+            with contextlib.suppress(sqlite3.Error): fila.renovar(id_trabalho, worker, lease_s)
+
+    def __enter__(self): self._thread.start(); return self
+    def __exit__(self, *exc): self._parar.set(); self._thread.join()
+
+def _pasta_do_trabalho(pasta_logs, trabalho):
+    pasta = os.path.join(pasta_logs, trabalho["varredura"], f"{trabalho['nivel'].lstrip('#')}_semente_{trabalho['semente']}")
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+def executar_trabalho(trabalho, pasta_logs, opcoes_agente, espelho=None, usar_pool=False):
+    AgenteClasse = PERSONAS[trabalho["persona"]]
+    pasta = _pasta_do_trabalho(pasta_logs, trabalho)
+    opcoes = {**opcoes_agente, "semente": trabalho["semente"], "seletor_nivel": trabalho["nivel"]}
+    if trabalho["backend"] == "simulado":
+        agente = versao_simulada(AgenteClasse)(SimuladorCargoBot(trabalho["nivel"]), log_folder=pasta, **opcoes)
+        agente.run()
+        return agente.metricas_gerais
+    # Primeiro trabalho, Chromium caído ou pool preparado em outro nível: sobe o navegador (e o pool) de novo
+    navegador, pool = teste_agentes._navegador_do_worker, teste_agentes._pool_do_worker
+    if navegador is None or not navegador.is_connected() or (usar_pool and pool.seletor_nivel != trabalho["nivel"]):
+        with contextlib.suppress(Exception): _encerrar_worker_navegador()
+        _iniciar_worker_navegador(_opcoes_navegador_para(opcoes_agente), espelho, usar_pool, trabalho["nivel"])
+    metricas = _executar_agente_no_worker(AgenteClasse, pasta, opcoes, espelho)
+    # BaseAgent.run engole os erros da página: se o Chromium caiu no meio, as métricas não valem e o trabalho volta à fila
+    if not teste_agentes._navegador_do_worker.is_connected(): raise RuntimeError("Chromium desconectou durante o trabalho")
+    return metricas
+
+def rodar_worker(caminho_fila, pasta_logs="agent_run_logs", varredura=None, lease_s=LEASE_PADRAO_S, esperar_novos=False,
+                 opcoes_agente=None, espelho=None, usar_pool=False):
+    fila = FilaDeTrabalhos(caminho_fila)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    opcoes_agente = opcoes_agente or {}
+    feitos = 0
+    try:
+        while True:
+            trabalho = fila.pegar(worker, varredura, lease_s)
+            if trabalho is None:
+                em_execucao = fila.contagem_por_estado(varredura)[ESTADO_EM_EXECUCAO] # Sem --varredura: de qualquer varredura
+                if not esperar_novos and not em_execucao: break # Nada pendente nem lease de outro worker que possa voltar
+                time.sleep(INTERVALO_ESPERA_S); continue
+            print(f"[{worker}] Trabalho {trabalho['id']}: {trabalho['persona']} semente {trabalho['semente']} em {trabalho['nivel']} "
+                  f"({trabalho['backend']}, tentativa {trabalho['tentativas']})")
+            try:
+                with _RenovadorDeLease(fila, trabalho["id"], worker, lease_s):
+                    metricas = executar_trabalho(trabalho, pasta_logs, opcoes_agente, espelho, usar_pool)
+                metricas.update(semente=trabalho["semente"], nivel=trabalho["nivel"])
+                fila.concluir(trabalho["id"], worker, metricas)
+                feitos += 1
+            except Exception as e_trabalho:
+                print(f"!!! [{worker}] FALHA NO TRABALHO {trabalho['id']}: {e_trabalho}")
+                fila.registrar_erro(trabalho["id"], worker, e_trabalho)
+                with contextlib.suppress(Exception): _encerrar_worker_navegador() # Próximo trabalho sobe um Chromium novo
+            except BaseException: # KeyboardInterrupt/SystemExit: o trabalho não fica preso em execução até o lease vencer
+                with contextlib.suppress(Exception): fila.liberar(trabalho["id"], worker)
+                raise
+    finally:
+        with contextlib.suppress(Exception): _encerrar_worker_navegador()
+        fila.fechar()
+    print(f"[{worker}] Sem trabalhos pendentes. {feitos} concluídos por este worker.")
+    return feitos
+
+def _faixa_de_sementes(texto):
+    # "0-99" ou "1,5,7"
+    if "-" in texto:
+        inicio, fim = texto.split("-")
+        return range(int(inicio), int(fim) + 1)
+    return [int(semente) for semente in texto.split(",")]
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Fila de trabalhos (SQLite) para varreduras de personas do CargoBot.")
+    parser.add_argument("--fila", default=os.environ.get("AGENTES_FILA", "fila_trabalhos.sqlite"), help="Arquivo SQLite da fila")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_enfileirar = comandos.add_parser("enfileirar", help="Coordenador: cria (ou completa) uma varredura")
+    p_enfileirar.add_argument("varredura")
+    p_enfileirar.add_argument("--personas", default=",".join(PERSONAS), help="Nomes das classes, separados por vírgula")
+    p_enfileirar.add_argument("--sementes", default="0-9", help='Faixa "0-99" ou lista "1,5,7"')
+    p_enfileirar.add_argument("--nivel", default=SELETOR_NIVEL_ALVO)
+    p_enfileirar.add_argument("--backend", choices=BACKENDS, default="simulado")
+    p_enfileirar.add_argument("--max-tentativas", type=int, default=MAX_TENTATIVAS_PADRAO)
+    p_enfileirar.add_argument("--reabrir-falhas", action="store_true", help="Devolve à fila os trabalhos que esgotaram as tentativas")
+
+    p_worker = comandos.add_parser("worker", help="Pega e executa trabalhos até a fila esvaziar")
+    p_worker.add_argument("--varredura", help="Só trabalhos desta varredura")
+    p_worker.add_argument("--logs", default="agent_run_logs")
+    p_worker.add_argument("--lease", type=float, default=LEASE_PADRAO_S, help="Segundos sem renovação até o trabalho voltar à fila")
+    p_worker.add_argument("--esperar", action="store_true", help="Continua esperando novos trabalhos com a fila vazia")
+
+    p_status = comandos.add_parser("status", help="Contagem de trabalhos por estado")
+    p_status.add_argument("varredura")
+
+    p_resumo = comandos.add_parser("resumo", help="Resumo das métricas dos trabalhos concluídos")
+    p_resumo.add_argument("varredura")
+    p_resumo.add_argument("--logs", default="agent_run_logs")
+
+    args = parser.parse_args(argumentos)
+    if args.comando == "worker":
+        return rodar_worker(args.fila, args.logs, args.varredura, args.lease, args.esperar,
+                            opcoes_agente=_opcoes_agente_do_ambiente(), espelho=espelho_do_ambiente(),
+                            usar_pool=os.environ.get("AGENTES_POOL") == "1")
+    fila = FilaDeTrabalhos(args.fila)
+    try:
+        if args.comando == "enfileirar":
+            novos = fila.enfileirar(args.varredura, args.personas.split(","), _faixa_de_sementes(args.sementes), args.nivel, args.backend, args.max_tentativas)
+            reabertos = fila.reabrir_falhas(args.varredura) if args.reabrir_falhas else 0
+            print(f"Varredura '{args.varredura}': {novos} trabalhos novos, {reabertos} reabertos. Estado: {fila.contagem_por_estado(args.varredura)}")
+        elif args.comando == "status":
+            print(f"Varredura '{args.varredura}': {fila.contagem_por_estado(args.varredura)}")
+        elif args.comando == "resumo":
+            os.makedirs(os.path.join(args.logs, args.varredura), exist_ok=True)
+            _imprimir_resumo_da_execucao(fila.resultados(args.varredura), os.path.join(args.logs, args.varredura))
+    finally:
+        fila.fechar()
+
+if __name__ == "__main__":
+    main()
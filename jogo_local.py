@@ -0,0 +1,140 @@
+from urllib.parse import urlparse
+import json
+
+from simulador_cargobot import SimuladorCargoBot, NIVEIS, TAMANHO_REGISTROS, MAX_PASSOS_PADRAO
+from teste_agentes import CARGOBOT_BASE_URL, COMANDO_POR_SELETOR_PALETA
+
+# Substituto local do site do CargoBot para benchmarks e CI: uma página com os mesmos seletores
+# (start, pacote, níveis, paleta, registros, Play, Clear e modal) servida por interceptação de rotas,
+# como o EspelhoCargoBot. O Play manda os registros para o SimuladorCargoBot por uma rota interna
+# e mostra o desfecho com os mesmos textos do jogo. Nenhuma requisição sai para a rede.
+
+CAMINHO_EXECUTAR = "/__jogo_local/executar"
+MS_POR_PASSO_PADRAO = 15 # "Animação" da garra: quanto a página demora por passo executado
+MAX_MS_EXECUCAO = 2000 # Teto da animação; fica abaixo da janela de estabilidade da detecção de desfecho
+TEXTO_POR_DESFECHO = {"sucesso": "YOU GOT IT!", "falha": "CRASHED"} # Os demais desfechos não mostram texto, como no jogo
+
+PAGINA_JOGO = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>CargoBot (local)</title>
+<style>
+  .tela { display: none; } .tela.ativa { display: block; }
+  .ferramenta, .slot, .botao, .nivel, #click2start, #pack_easy p { display: inline-block; min-width: 40px; height: 40px; margin: 2px;
+    border: 1px solid #888; text-align: center; line-height: 40px; user-select: none; cursor: pointer; }
+  #custom_modal { display: none; } #custom_modal.aberto { display: block; }
+</style></head>
+<body>
+<div id="tela_inicio" class="tela ativa"><div id="click2start">Click to start</div></div>
+<div id="tela_pacotes" class="tela"><div id="pack_easy"><p>Easy</p></div></div>
+<div id="tela_niveis" class="tela">__NIVEIS__</div>
+<div id="tela_jogo" class="tela">
+  <div id="toolbox">__FERRAMENTAS__</div>
+  <div id="registros">__REGISTROS__</div>
+  <div id="play" class="botao">Play</div> <div id="btn_clear" class="botao">Clear</div>
+  <div id="execucao"></div> <div id="resultado"></div>
+  <div id="custom_modal"><p id="custom_modal_btn_clear_text">CLEAR</p></div>
+</div>
+<script>
+const CONFIG = __CONFIG__;
+let nivel = null, arrastando = null, rodando = false;
+const dormir = ms => new Promise(resolve => setTimeout(resolve, ms));
+const mostrar = id => document.querySelectorAll(".tela").forEach(tela => tela.classList.toggle("ativa", tela.id === id));
+const slots = () => [...document.querySelectorAll(".slot")];
+
+document.getElementById("click2start").addEventListener("click", () => mostrar("tela_pacotes"));
+document.querySelector("#pack_easy p").addEventListener("click", () => mostrar("tela_niveis"));
+document.querySelectorAll(".nivel").forEach(botao => botao.addEventListener("click", () => { nivel = botao.dataset.nivel; mostrar("tela_jogo"); }));
+
+// Arrastar = mousedown na ferramenta + mouseup sobre o slot (é o que drag_to e a carga rápida fazem)
+document.querySelectorAll(".ferramenta").forEach(ferramenta => ferramenta.addEventListener("mousedown", evento => {
+  arrastando = ferramenta.dataset.cmd; evento.preventDefault();
+}));
+document.addEventListener("mouseup", evento => {
+  const alvo = document.elementFromPoint(evento.clientX, evento.clientY);
+  if (arrastando && alvo && alvo.classList.contains("slot")) { alvo.dataset.cmd = arrastando; alvo.textContent = arrastando; }
+  arrastando = null;
+});
+
+document.getElementById("play").addEventListener("click", async () => {
+  if (rodando) return;
+  rodando = true;
+  document.getElementById("resultado").textContent = "";
+  const registros = {};
+  document.querySelectorAll(".registro").forEach(registro => {
+    registros[registro.dataset.registro] = [...registro.querySelectorAll(".slot")].map(slot => slot.dataset.cmd || null);
+  });
+  const resposta = await fetch(CONFIG.urlExecutar, {method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify({nivel, registros})});
+  const {desfecho, passos} = await resposta.json();
+  const duracao = Math.min(passos * CONFIG.msPorPasso, CONFIG.maxMsExecucao);
+  for (let decorrido = 0; decorrido < duracao; decorrido += 100) { // O DOM muda enquanto a garra "anda"
+    document.getElementById("execucao").textContent = `passo ${Math.ceil(passos * decorrido / Math.max(duracao, 1))}/${passos}`;
+    await dormir(Math.min(100, duracao - decorrido));
+  }
+  document.getElementById("execucao").textContent = `passo ${passos}/${passos}`;
+  document.getElementById("resultado").textContent = CONFIG.textoPorDesfecho[desfecho] || "";
+  rodando = false;
+});
+
+document.getElementById("btn_clear").addEventListener("click", () => {
+  if (slots().some(slot => slot.dataset.cmd)) document.getElementById("custom_modal").classList.add("aberto");
+});
+document.getElementById("custom_modal_btn_clear_text").addEventListener("click", () => {
+  slots().forEach(slot => { delete slot.dataset.cmd; slot.textContent = ""; });
+  document.getElementById("resultado").textContent = "";
+  document.getElementById("execucao").textContent = "";
+  document.getElementById("custom_modal").classList.remove("aberto");
+});
+</script>
+</body></html>
+"""
+
+def _montar_pagina(ms_por_passo):
+    # Só os níveis cujo id é um seletor CSS ("#level_0") podem ser clicados como no site real
+    niveis = "".join(f'<div id="{nivel_id[1:]}" class="nivel" data-nivel="{nivel_id}">{nivel["nome"]}</div>'
+                     for nivel_id, nivel in NIVEIS.items() if nivel_id.startswith("#"))
+    ferramentas = "".join(f'<div id="{seletor[1:]}" class="ferramenta" data-cmd="{comando}">{comando}</div>'
+                          for seletor, comando in COMANDO_POR_SELETOR_PALETA.items())
+    registros = "".join(f'<div class="registro" data-registro="{registro}">{registro.upper()} '
+                        + "".join(f'<div id="reg_{registro[1:]}_{i}" class="slot"></div>' for i in range(tamanho)) + "</div>"
+                        for registro, tamanho in TAMANHO_REGISTROS.items())
+    config = {"urlExecutar": CAMINHO_EXECUTAR, "msPorPasso": ms_por_passo, "maxMsExecucao": MAX_MS_EXECUCAO, "textoPorDesfecho": TEXTO_POR_DESFECHO}
+    return (PAGINA_JOGO.replace("__NIVEIS__", niveis).replace("__FERRAMENTAS__", ferramentas)
+            .replace("__REGISTROS__", registros).replace("__CONFIG__", json.dumps(config)))
+
+class JogoLocal:
+    # Mesma interface do EspelhoCargoBot (instalar/instalar_async): pode ser passado como 'espelho' a qualquer runner
+    def __init__(self, ms_por_passo=MS_POR_PASSO_PADRAO, max_passos=MAX_PASSOS_PADRAO):
+        self.max_passos = max_passos
+        self.pagina = _montar_pagina(ms_por_passo)
+        self._host = urlparse(CARGOBOT_BASE_URL).netloc
+
+    def _executar(self, corpo):
+        dados = json.loads(corpo)
+        simulador = SimuladorCargoBot(dados["nivel"], self.max_passos)
+        for registro, comandos in dados["registros"].items():
+            for indice, comando in enumerate(comandos):
+                if comando: simulador.colocar(registro, indice, comando)
+        return simulador.executar()
+
+    def _resposta(self, request):
+        # kwargs do route.fulfill, ou None para abortar (tudo fora do host do jogo)
+        partes = urlparse(request.url)
+        if partes.netloc != self._host: return None
+        if partes.path.endswith(CAMINHO_EXECUTAR):
+            return {"status": 200, "content_type": "application/json", "body": json.dumps(self._executar(request.post_data))}
+        return {"status": 200, "content_type": "text/html; charset=utf-8", "body": self.pagina}
+
+    def tratar_rota(self, route):
+        resposta = self._resposta(route.request)
+        if resposta is None: route.abort("blockedbyclient")
+        else: route.fulfill(**resposta)
+
+    async def tratar_rota_async(self, route):
+        resposta = self._resposta(route.request)
+        if resposta is None: await route.abort("blockedbyclient")
+        else: await route.fulfill(**resposta)
+
+    def instalar(self, contexto):
+        contexto.route("**/*", self.tratar_rota)
+
+    async def instalar_async(self, contexto):
+        await contexto.route("**/*", self.tratar_rota_async)
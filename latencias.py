@@ -0,0 +1,95 @@
+from bisect import bisect_left
+import contextlib
+import time
+
+# Histogramas de latência por operação do agente. As faixas são fixas (escala logarítmica), então
+# registrar custa um bisect e histogramas de agentes/workers diferentes se somam sem guardar amostras.
+
+OPERACOES = ("navegacao", "espera_locator", "drag_to", "carga_rapida", "clique_play", "clear", "pensar", "verificacao")
+LIMITES_FAIXAS_S = tuple(0.001 * 2 ** (i / 4) for i in range(69)) # 1ms .. ~131s, ~19% de resolução por faixa
+
+class HistogramaLatencia:
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_FAIXAS_S) + 1) # Última faixa: acima do maior limite
+        self.n = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def registrar(self, segundos):
+        self.contagens[bisect_left(LIMITES_FAIXAS_S, segundos)] += 1
+        self.n += 1
+        self.total_s += segundos
+        if segundos > self.max_s: self.max_s = segundos
+
+    def percentil(self, p):
+        # Limite superior da faixa onde cai o percentil p (0..100), nunca acima do máximo visto
+        if not self.n: return None
+        alvo, acumulado = p / 100 * self.n, 0
+        for indice, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if contagem and acumulado >= alvo: return min(LIMITES_FAIXAS_S[indice] if indice < len(LIMITES_FAIXAS_S) else self.max_s, self.max_s)
+        return self.max_s
+
+    def somar(self, outro):
+        self.contagens = [a + b for a, b in zip(self.contagens, outro.contagens)]
+        self.n += outro.n
+        self.total_s += outro.total_s
+        self.max_s = max(self.max_s, outro.max_s)
+
+    def como_dict(self):
+        # Só as faixas ocupadas: é o que viaja dentro de metricas_gerais entre processos
+        return {"faixas": {i: c for i, c in enumerate(self.contagens) if c}, "n": self.n,
+                "total_s": round(self.total_s, 4), "max_s": round(self.max_s, 4)}
+
+    @classmethod
+    def de_dict(cls, dados):
+        histograma = cls()
+        for indice, contagem in dados["faixas"].items(): histograma.contagens[int(indice)] = contagem
+        histograma.n, histograma.total_s, histograma.max_s = dados["n"], dados["total_s"], dados["max_s"]
+        return histograma
+
+class MedidorLatencias:
+    def __init__(self):
+        self.histogramas = {}
+        self._pensar_dormido_s = 0.0 # Sono real do _pensar, descontado das operações que o envolvem
+
+    def registrar(self, operacao, segundos):
+        if operacao not in self.histogramas: self.histogramas[operacao] = HistogramaLatencia()
+        self.histogramas[operacao].registrar(segundos)
+
+    def registrar_pensar(self, duracao, dormido):
+        self.registrar("pensar", duracao)
+        if dormido: self._pensar_dormido_s += duracao
+
+    @contextlib.contextmanager
+    def medir(self, operacao):
+        inicio, pensar_antes = time.perf_counter(), self._pensar_dormido_s
+        try: yield
+        finally: self.registrar(operacao, max(0.0, time.perf_counter() - inicio - (self._pensar_dormido_s - pensar_antes)))
+
+    def como_dict(self):
+        return {operacao: histograma.como_dict() for operacao, histograma in self.histogramas.items()}
+
+class MedidorDesligado:
+    # Mesma interface, sem custo: usado quando medir_latencias=False
+    def registrar(self, operacao, segundos): pass
+    def registrar_pensar(self, duracao, dormido): pass
+    def medir(self, operacao): return contextlib.nullcontext()
+    def como_dict(self): return None
+
+def somar_latencias(lista_de_latencias):
+    # lista de dicts como_dict() (um por agente) -> {operacao: HistogramaLatencia} somado
+    total = {}
+    for latencias in lista_de_latencias:
+        for operacao, dados in (latencias or {}).items():
+            total.setdefault(operacao, HistogramaLatencia()).somar(HistogramaLatencia.de_dict(dados))
+    return total
+
+def linhas_do_relatorio(histogramas, duracao_total_s=None):
+    # Uma linha por operação: n, p50, p95, máx, tempo total e fatia da duração (quando informada)
+    linhas = [f"    {'operação':<15}{'n':>6}{'p50':>10}{'p95':>10}{'máx':>10}{'total':>11}{'% dur.':>8}"]
+    for operacao in sorted(histogramas, key=lambda op: OPERACOES.index(op) if op in OPERACOES else len(OPERACOES)):
+        h = histogramas[operacao]
+        fatia = f"{100 * h.total_s / duracao_total_s:7.1f}%" if duracao_total_s else f"{'-':>8}"
+        linhas.append(f"    {operacao:<15}{h.n:>6}{h.percentil(50):>9.3f}s{h.percentil(95):>9.3f}s{h.max_s:>9.3f}s{h.total_s:>10.2f}s{fatia}")
+    return linhas
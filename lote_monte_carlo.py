@@ -0,0 +1,185 @@
+import asyncio
+import collections
+import csv
+import os
+
+import numpy as np
+
+from registro_eventos import VERBOSIDADE_SILENCIOSO
+from teste_agentes import (
+    SELETOR_NIVEL_ALVO,
+    AgenteSolucionadorPerfeito, AgenteInicianteExplorador, AgenteImpulsivoAleatorio,
+    AgenteMetodicoF1, AgenteConfusoComChamadas, AgenteSuperOtimista,
+    _criar_pasta_da_execucao, _opcoes_agente_do_ambiente,
+)
+
+try: import pandas as pd # Opcional: só para gravar Parquet
+except ImportError: pd = None
+
+# Lote Monte Carlo: cada persona roda uma vez por semente. As métricas de cada execução vão direto
+# para colunas (e para um CSV, linha a linha); as agregações por persona são feitas com NumPy.
+
+COLUNAS_EXECUCAO = ("persona", "semente", "resolvido", "tentativas", "comandos_colocados",
+                    "cliques_play", "usos_clear", "erros_de_script", "duracao_s", "passos_simulacao", "falhou")
+Z_95 = 1.959964 # Intervalo de confiança de 95% (Wilson) para a taxa de resolução
+
+def _linha_da_execucao(AgenteClasse, semente, metricas):
+    falhou = "erro_execucao" in metricas # _resultado_de_falha: o agente nem chegou a rodar
+    return {"persona": AgenteClasse.__name__, "semente": semente,
+            "resolvido": bool(metricas.get("nivel_resolvido_final")),
+            "tentativas": metricas.get("total_tentativas_feitas"),
+            "comandos_colocados": metricas.get("total_comandos_colocados"),
+            "cliques_play": metricas.get("total_cliques_play"),
+            "usos_clear": metricas.get("total_usos_clear"),
+            "erros_de_script": metricas.get("erros_de_script"),
+            "duracao_s": metricas.get("duracao_total_s"),
+            "passos_simulacao": metricas.get("total_passos_simulacao"), # Só no backend simulado
+            "falhou": falhou}
+
+class ColunasDoLote:
+    def __init__(self, caminho_csv):
+        self.colunas = {coluna: [] for coluna in COLUNAS_EXECUCAO}
+        self._arquivo = open(caminho_csv, "w", encoding="utf-8", newline="")
+        self._escritor = csv.DictWriter(self._arquivo, fieldnames=COLUNAS_EXECUCAO)
+        self._escritor.writeheader()
+
+    def adicionar(self, linhas):
+        for linha in linhas:
+            for coluna in COLUNAS_EXECUCAO: self.colunas[coluna].append(linha[coluna])
+        self._escritor.writerows(linhas)
+        self._arquivo.flush() # Um lote interrompido ainda deixa no CSV tudo o que já rodou
+
+    def como_arrays(self):
+        numericas = ("tentativas", "comandos_colocados", "cliques_play", "usos_clear", "erros_de_script", "duracao_s", "passos_simulacao")
+        arrays = {coluna: np.array([np.nan if v is None else v for v in self.colunas[coluna]], dtype=float) for coluna in numericas}
+        arrays["persona"] = np.array(self.colunas["persona"])
+        arrays["semente"] = np.array(self.colunas["semente"], dtype=int)
+        arrays["resolvido"] = np.array(self.colunas["resolvido"], dtype=bool)
+        arrays["falhou"] = np.array(self.colunas["falhou"], dtype=bool)
+        return arrays
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self._arquivo.close()
+
+def intervalo_wilson(sucessos, n, z=Z_95):
+    # Vetorizado: sucessos e n são arrays (um valor por persona)
+    p = sucessos / n
+    denominador = 1 + z ** 2 / n
+    centro = (p + z ** 2 / (2 * n)) / denominador
+    margem = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominador
+    return centro - margem, centro + margem
+
+def _media_por_grupo(valores, grupo, num_grupos, mascara=None):
+    validos = ~np.isnan(valores) if mascara is None else mascara & ~np.isnan(valores)
+    soma = np.bincount(grupo, weights=np.where(validos, valores, 0.0), minlength=num_grupos)
+    contagem = np.bincount(grupo, weights=validos, minlength=num_grupos)
+    return np.divide(soma, contagem, out=np.full(num_grupos, np.nan), where=contagem > 0)
+
+def _percentil_por_grupo(valores, grupo, num_grupos, q):
+    # Percentil pelo posto mais próximo, todos os grupos de uma vez: ordena por (grupo, valor); NaN fica no fim de cada grupo
+    ordem = np.lexsort((valores, grupo))
+    tamanhos = np.bincount(grupo, minlength=num_grupos)
+    validos = np.bincount(grupo, weights=~np.isnan(valores), minlength=num_grupos).astype(int)
+    inicio = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+    posicao = inicio + np.maximum(np.ceil(q / 100 * validos).astype(int) - 1, 0)
+    resultado = valores[ordem][np.minimum(posicao, len(valores) - 1)]
+    return np.where(validos > 0, resultado, np.nan)
+
+def agregar_por_persona(arrays):
+    personas, grupo = np.unique(arrays["persona"], return_inverse=True)
+    num_grupos = len(personas)
+    execucoes = np.bincount(grupo, minlength=num_grupos)
+    resolvidas = np.bincount(grupo, weights=arrays["resolvido"], minlength=num_grupos)
+    ic_inferior, ic_superior = intervalo_wilson(resolvidas, execucoes)
+    return {
+        "persona": personas, "execucoes": execucoes, "resolvidas": resolvidas.astype(int),
+        "taxa_resolucao": resolvidas / execucoes, "ic95_inferior": ic_inferior, "ic95_superior": ic_superior,
+        "tentativas_ate_sucesso_media": _media_por_grupo(arrays["tentativas"], grupo, num_grupos, mascara=arrays["resolvido"]),
+        "tentativas_ate_sucesso_p50": _percentil_por_grupo(np.where(arrays["resolvido"], arrays["tentativas"], np.nan), grupo, num_grupos, 50),
+        "comandos_media": _media_por_grupo(arrays["comandos_colocados"], grupo, num_grupos),
+        "comandos_p95": _percentil_por_grupo(arrays["comandos_colocados"], grupo, num_grupos, 95),
+        "duracao_media_s": _media_por_grupo(arrays["duracao_s"], grupo, num_grupos),
+        "duracao_p50_s": _percentil_por_grupo(arrays["duracao_s"], grupo, num_grupos, 50),
+        "duracao_p95_s": _percentil_por_grupo(arrays["duracao_s"], grupo, num_grupos, 95),
+        "passos_simulacao_media": _media_por_grupo(arrays["passos_simulacao"], grupo, num_grupos),
+        "falhas_de_execucao": np.bincount(grupo, weights=arrays["falhou"], minlength=num_grupos).astype(int),
+    }
+
+def _gravar_resumo_csv(resumo, caminho_csv):
+    colunas = list(resumo)
+    with open(caminho_csv, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(colunas)
+        for i in range(len(resumo["persona"])):
+            escritor.writerow([round(float(resumo[c][i]), 4) if resumo[c].dtype.kind == "f" else resumo[c][i] for c in colunas])
+
+def _gravar_parquet(arrays, caminho_parquet):
+    if pd is None: return False
+    try: pd.DataFrame(arrays).to_parquet(caminho_parquet, index=False)
+    except (ImportError, ValueError): return False # pandas sem pyarrow/fastparquet
+    return True
+
+def _imprimir_resumo_do_lote(resumo, repeticoes, pasta):
+    print(f"\n--- RESUMO MONTE CARLO ({repeticoes} sementes por persona) ---")
+    print(f"{'persona':<28}{'resolução':>10}{'IC 95%':>17}{'tent. até sucesso':>19}{'comandos':>10}{'duração p50/p95':>19}")
+    for i, persona in enumerate(resumo["persona"]):
+        ic = f"[{resumo['ic95_inferior'][i]:.2f}, {resumo['ic95_superior'][i]:.2f}]"
+        print(f"{persona:<28}{resumo['taxa_resolucao'][i]:>10.1%}{ic:>17}{resumo['tentativas_ate_sucesso_media'][i]:>19.2f}"
+              f"{resumo['comandos_media'][i]:>10.1f}{resumo['duracao_p50_s'][i]:>10.1f}s/{resumo['duracao_p95_s'][i]:.1f}s")
+    print(f"Execuções e resumo salvos em: {pasta}")
+
+def _executor_do_backend(backend, nivel_id, max_concorrentes):
+    # Devolve f(trabalhos, pasta, opcoes_agente, ao_concluir) -> [metricas_gerais, ...] na ordem; trabalhos = [(AgenteClasse, opcoes_proprias), ...]
+    # e ao_concluir(indice, metricas) é chamado a cada execução que termina
+    if backend == "simulado":
+        from agentes_simulados import rodar_agentes_simulados
+        return lambda trabalhos, pasta, opcoes, ao_concluir: rodar_agentes_simulados(trabalhos, pasta, nivel_id, opcoes, ao_concluir)
+    if backend == "async":
+        from agentes_async import rodar_agentes_async
+        return lambda trabalhos, pasta, opcoes, ao_concluir: asyncio.run(rodar_agentes_async(trabalhos, pasta, max_concorrentes, {**opcoes, "seletor_nivel": nivel_id}, ao_concluir=ao_concluir))
+    raise ValueError(f"Backend desconhecido para o lote: {backend}")
+
+def rodar_lote_monte_carlo(lista_de_agentes_classes, repeticoes=100, semente_inicial=0, backend="simulado",
+                           nivel_id=SELETOR_NIVEL_ALVO, opcoes_agente=None, max_concorrentes=8):
+    pasta = _criar_pasta_da_execucao()
+    executar = _executor_do_backend(backend, nivel_id, max_concorrentes)
+    opcoes_agente = {"verbosidade_console": VERBOSIDADE_SILENCIOSO, **(opcoes_agente or {})}
+    trabalhos = [] # Todos os pares (persona, semente) numa chamada só: no async, num único navegador
+    for semente in range(semente_inicial, semente_inicial + repeticoes):
+        pasta_semente = os.path.join(pasta, f"semente_{semente}") # Mesma persona em sementes diferentes não divide o log
+        os.makedirs(pasta_semente, exist_ok=True)
+        trabalhos += [(AgenteClasse, {"semente": semente, "log_folder": pasta_semente}) for AgenteClasse in lista_de_agentes_classes]
+    faltando_por_semente = collections.Counter(opcoes["semente"] for _, opcoes in trabalhos)
+    resolvidas_por_semente = collections.Counter()
+    with ColunasDoLote(os.path.join(pasta, "execucoes_lote.csv")) as colunas:
+        def registrar_execucao(indice, metricas):
+            # Cada execução vai para as colunas e o CSV assim que termina: um lote interrompido não perde o que já rodou
+            AgenteClasse, opcoes = trabalhos[indice]
+            linha = _linha_da_execucao(AgenteClasse, opcoes["semente"], metricas)
+            colunas.adicionar([linha])
+            faltando_por_semente[linha["semente"]] -= 1
+            resolvidas_por_semente[linha["semente"]] += linha["resolvido"]
+            if not faltando_por_semente[linha["semente"]]:
+                print(f"Semente {linha['semente']}: {resolvidas_por_semente[linha['semente']]}/{len(lista_de_agentes_classes)} personas resolveram.")
+        executar(trabalhos, pasta, opcoes_agente, registrar_execucao)
+    arrays = colunas.como_arrays()
+    resumo = agregar_por_persona(arrays)
+    _gravar_resumo_csv(resumo, os.path.join(pasta, "resumo_lote.csv"))
+    _gravar_parquet(arrays, os.path.join(pasta, "execucoes_lote.parquet"))
+    _imprimir_resumo_do_lote(resumo, repeticoes, pasta)
+    return resumo
+
+if __name__ == "__main__":
+    agentes_a_testar = [
+        AgenteSolucionadorPerfeito,
+        AgenteInicianteExplorador,
+        AgenteImpulsivoAleatorio,
+        AgenteMetodicoF1,
+        AgenteConfusoComChamadas,
+        AgenteSuperOtimista,
+    ]
+    rodar_lote_monte_carlo(agentes_a_testar, repeticoes=int(os.environ.get("AGENTES_REPETICOES", 100)),
+                           semente_inicial=int(os.environ.get("AGENTES_SEMENTE_INICIAL", 0)),
+                           backend=os.environ.get("AGENTES_BACKEND", "simulado"),
+                           nivel_id=os.environ.get("AGENTES_NIVEL", SELETOR_NIVEL_ALVO),
+                           opcoes_agente=_opcoes_agente_do_ambiente())
@@ -0,0 +1,51 @@
+from collections import deque
+import json
+import time
+
+# Registro de eventos dos agentes: cada _log vira um evento estruturado (JSONL) e uma linha do log em texto,
+# guardados em memória e gravados em lote, em vez de abrir/fechar o arquivo a cada linha.
+
+# Verbosidade do console: o que o registro imprime além de gravar
+VERBOSIDADE_SILENCIOSO = 0 # Nada no console
+VERBOSIDADE_RESUMO = 1 # Só o que não é INFO: erros, avisos, desfechos e fim de sessão
+VERBOSIDADE_COMPLETO = 2 # Tudo, como o print de antes
+
+TAMANHO_LOTE_PADRAO = 200 # Eventos acumulados antes de gravar
+INTERVALO_FLUSH_PADRAO_S = 2.0 # Grava também se o lote mais antigo passar deste tempo
+MAX_EVENTOS_EM_MEMORIA = 500 # log_acoes guarda só as últimas linhas
+
+class RegistroEventos:
+    def __init__(self, caminho_jsonl, caminho_texto, verbosidade=VERBOSIDADE_COMPLETO, tamanho_lote=TAMANHO_LOTE_PADRAO,
+                 intervalo_flush_s=INTERVALO_FLUSH_PADRAO_S, max_em_memoria=MAX_EVENTOS_EM_MEMORIA, cabecalho=None):
+        self.caminho_jsonl = caminho_jsonl
+        self.caminho_texto = caminho_texto
+        self.verbosidade = verbosidade
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush_s = intervalo_flush_s
+        self.memoria = deque(maxlen=max_em_memoria)
+        self._pendentes_jsonl = []
+        self._pendentes_texto = [cabecalho] if cabecalho else []
+        self._ultimo_flush = time.monotonic()
+        for caminho in (caminho_jsonl, caminho_texto): open(caminho, "w", encoding="utf-8").close() # Começa cada sessão do zero
+
+    def registrar(self, evento, linha_texto):
+        self._pendentes_jsonl.append(json.dumps(evento, ensure_ascii=False, default=str))
+        self._pendentes_texto.append(linha_texto)
+        self.memoria.append(linha_texto)
+        if self.verbosidade >= VERBOSIDADE_COMPLETO or (self.verbosidade == VERBOSIDADE_RESUMO and evento.get("tipo") != "INFO"):
+            print(linha_texto)
+        if len(self._pendentes_jsonl) >= self.tamanho_lote or time.monotonic() - self._ultimo_flush >= self.intervalo_flush_s:
+            self.flush()
+
+    def escrever_texto(self, texto):
+        # Blocos que só vão para o log em texto (ex.: métricas finais)
+        self._pendentes_texto.append(texto)
+
+    def flush(self):
+        self._ultimo_flush = time.monotonic()
+        for caminho, pendentes in ((self.caminho_jsonl, self._pendentes_jsonl), (self.caminho_texto, self._pendentes_texto)):
+            if not pendentes: continue
+            try:
+                with open(caminho, "a", encoding="utf-8") as f: f.write("\n".join(pendentes) + "\n")
+            except Exception as e_log_write: print(f"!!! ERRO AO ESCREVER LOG {caminho}: {e_log_write}")
+            pendentes.clear()
@@ -0,0 +1,113 @@
+import copy
+
+# Simulador CargoBot em Python puro: roda o programa F1..F4 de uma persona sem navegador.
+# Não depende do Playwright, então pode ser importado em qualquer ambiente.
+
+CMD_PEGAR_SOLTAR = "grab" # "Baixo" na paleta: pega o bloco do topo ou solta o que a garra segura
+CMD_DIREITA = "right"
+CMD_ESQUERDA = "left"
+CMD_CHAMAR = {"f1": "call_f1", "f2": "call_f2", "f3": "call_f3", "f4": "call_f4"}
+TAMANHO_REGISTROS = {"f1": 8, "f2": 8, "f3": 8, "f4": 5}
+MAX_PASSOS_PADRAO = 2000 # Programas recursivos sem fim param aqui como "tempo_esgotado"
+
+# Desfechos iguais aos que o BaseAgent detecta no jogo real
+DESFECHO_SUCESSO = "sucesso"
+DESFECHO_FALHA = "falha" # Batida: garra fora do trilho ou pilha acima do limite
+DESFECHO_TERMINOU = "terminou_sem_sucesso"
+DESFECHO_TEMPO_ESGOTADO = "tempo_esgotado"
+
+# Cada nível: pilhas iniciais (base -> topo), objetivo, posição inicial da garra e altura máxima das pilhas.
+# "#level_0" é o nível "easy" usado pelas personas: quatro blocos que a solução de 29 comandos
+# do AgenteSolucionadorPerfeito leva da primeira coluna para a terceira.
+NIVEIS = {
+    "#level_0": {
+        "nome": "Easy - Nível 0",
+        "pilhas": [["amarelo"] * 4, [], []],
+        "objetivo": [[], [], ["amarelo"] * 4],
+        "posicao_garra": 0, "altura_maxima": 6,
+    },
+    "cargo_101": {
+        "nome": "Cargo 101 (um bloco para a direita)",
+        "pilhas": [["amarelo"], []],
+        "objetivo": [[], ["amarelo"]],
+        "posicao_garra": 0, "altura_maxima": 6,
+    },
+    "transportador": {
+        "nome": "Transportador (pilha inteira para o fim do trilho)",
+        "pilhas": [["amarelo"] * 4, [], [], []],
+        "objetivo": [[], [], [], ["amarelo"] * 4],
+        "posicao_garra": 0, "altura_maxima": 6,
+    },
+    "inversor": {
+        "nome": "Inversor (inverte a ordem das cores)",
+        "pilhas": [["azul", "vermelho", "verde", "amarelo"], [], []],
+        "objetivo": [[], [], ["amarelo", "verde", "vermelho", "azul"]],
+        "posicao_garra": 0, "altura_maxima": 6,
+    },
+}
+
+class SimuladorCargoBot:
+    def __init__(self, nivel_id="#level_0", max_passos=MAX_PASSOS_PADRAO):
+        self.max_passos = max_passos
+        self.carregar_nivel(nivel_id)
+
+    def carregar_nivel(self, nivel_id):
+        if nivel_id not in NIVEIS: raise ValueError(f"Nível desconhecido para o simulador: {nivel_id}")
+        self.nivel_id = nivel_id
+        self.nivel = NIVEIS[nivel_id]
+        self.limpar_registros()
+        self.reiniciar_tabuleiro()
+
+    def limpar_registros(self):
+        self.registros = {nome: [None] * tamanho for nome, tamanho in TAMANHO_REGISTROS.items()}
+
+    def reiniciar_tabuleiro(self):
+        self.pilhas = copy.deepcopy(self.nivel["pilhas"])
+        self.posicao_garra = self.nivel["posicao_garra"]
+        self.bloco_na_garra = None
+        self.ultimo_resultado = None
+
+    def colocar(self, registro, indice, comando):
+        if registro not in self.registros or not 0 <= indice < len(self.registros[registro]):
+            raise ValueError(f"Slot inexistente: {registro}[{indice}]")
+        self.registros[registro][indice] = comando
+
+    def _objetivo_alcancado(self):
+        return self.bloco_na_garra is None and self.pilhas == self.nivel["objetivo"]
+
+    def _pegar_ou_soltar(self):
+        pilha = self.pilhas[self.posicao_garra]
+        if self.bloco_na_garra is None:
+            if pilha: self.bloco_na_garra = pilha.pop()
+            return True
+        if len(pilha) >= self.nivel["altura_maxima"]: return False
+        pilha.append(self.bloco_na_garra)
+        self.bloco_na_garra = None
+        return True
+
+    def executar(self):
+        """Roda o programa a partir de F1 e devolve {"desfecho", "passos"}; o tabuleiro volta ao início antes."""
+        self.reiniciar_tabuleiro()
+        programa = {nome: [cmd for cmd in slots if cmd is not None] for nome, slots in self.registros.items()}
+        pilha_chamadas = [] # Endereços de retorno (registro, próximo índice)
+        registro_atual, indice, passos, desfecho = "f1", 0, 0, None
+        while desfecho is None:
+            if indice >= len(programa[registro_atual]):
+                if not pilha_chamadas: desfecho = DESFECHO_TERMINOU; break
+                registro_atual, indice = pilha_chamadas.pop(); continue
+            if passos >= self.max_passos: desfecho = DESFECHO_TEMPO_ESGOTADO; break
+            comando = programa[registro_atual][indice]
+            passos += 1
+            indice += 1
+            if comando == CMD_PEGAR_SOLTAR:
+                if not self._pegar_ou_soltar(): desfecho = DESFECHO_FALHA
+                elif self._objetivo_alcancado(): desfecho = DESFECHO_SUCESSO
+            elif comando in (CMD_DIREITA, CMD_ESQUERDA):
+                self.posicao_garra += 1 if comando == CMD_DIREITA else -1
+                if not 0 <= self.posicao_garra < len(self.pilhas): desfecho = DESFECHO_FALHA
+            else:
+                destino = next(nome for nome, cmd in CMD_CHAMAR.items() if cmd == comando)
+                if indice < len(programa[registro_atual]): pilha_chamadas.append((registro_atual, indice)) # Chamada no fim = salto (sem retorno)
+                registro_atual, indice = destino, 0
+        self.ultimo_resultado = {"desfecho": desfecho, "passos": passos}
+        return self.ultimo_resultado
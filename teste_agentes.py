@@ -1,8 +1,21 @@
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util as mp_util
+import asyncio
+import collections
+import contextlib
+import functools
+import inspect
+import json
 import time
 import random
 import os
 
+from cache_desfechos import CacheDeDesfechos, chave_do_programa
+from latencias import MedidorLatencias, MedidorDesligado, somar_latencias, linhas_do_relatorio
+from registro_eventos import RegistroEventos, VERBOSIDADE_COMPLETO
+from simulador_cargobot import CMD_PEGAR_SOLTAR, CMD_DIREITA, CMD_ESQUERDA, CMD_CHAMAR
+
 CARGOBOT_BASE_URL = "https://i4ds.github.io/CargoBot/"
 # --- SELETORES ---
 SELETOR_START_THE_GAME = "#click2start" 
@@ -19,9 +32,100 @@ F1_SLOTS = [f"#reg_1_{i}" for i in range(8)]
 F2_SLOTS = [f"#reg_2_{i}" for i in range(8)] 
 F3_SLOTS = [f"#reg_3_{i}" for i in range(8)]
 F4_SLOTS = [f"#reg_4_{i}" for i in range(5)] 
+SLOTS_POR_PROGRAMA = {"programa_f1": F1_SLOTS, "programa_f2": F2_SLOTS, "programa_f3": F3_SLOTS, "programa_f4": F4_SLOTS}
+TODOS_SLOTS = F1_SLOTS + F2_SLOTS + F3_SLOTS + F4_SLOTS
 SELETOR_BTN_PLAY_JOGO = "#play"
 SELETOR_BTN_CLEAR_JOGO = "#btn_clear"
 MODAL_CLEAR_CONFIRM_SELECTOR = "p#custom_modal_btn_clear_text:text('CLEAR')"
+SELETOR_DOM_CONFIRMAR_CLEAR = "p#custom_modal_btn_clear_text" # Mesmo botão do modal, em CSS puro para uso dentro da página
+
+# --- CARGA RÁPIDA DE PROGRAMAS ---
+# Uma ida ao navegador por registro: rola o registro para a tela (slot abaixo da dobra não recebe o mouseup),
+# devolve o centro de cada elemento (null se não existe ou ficou fora da tela) e o conteúdo atual dos slots
+SCRIPT_PREPARAR_CARGA = """([seletoresPaleta, seletoresSlot]) => {
+    const slots = seletoresSlot.map(seletor => document.querySelector(seletor));
+    for (const slot of [slots[slots.length - 1], slots[0]]) if (slot) slot.scrollIntoView({block: "nearest", inline: "nearest"});
+    const centro = seletor => {
+        const elemento = document.querySelector(seletor);
+        if (!elemento) return null;
+        const r = elemento.getBoundingClientRect(), x = r.x + r.width / 2, y = r.y + r.height / 2;
+        return x >= 0 && y >= 0 && x < window.innerWidth && y < window.innerHeight ? [x, y] : null;
+    };
+    return {centros: [...seletoresPaleta, ...seletoresSlot].map(centro), conteudo: slots.map(slot => slot ? slot.outerHTML : null)};
+}"""
+# Slots cujo conteúdo ainda é o de antes da carga (o comando não chegou)
+SCRIPT_SLOTS_SEM_MUDANCA = """([seletores, antes]) => seletores.filter((seletor, i) => {
+    const slot = document.querySelector(seletor);
+    return !slot || slot.outerHTML === antes[i];
+})"""
+SCRIPT_CARGA_CONFIRMADA = f"argumentos => ({SCRIPT_SLOTS_SEM_MUDANCA})(argumentos).length === 0"
+TIMEOUT_CONFIRMAR_CARGA_MS = 2000
+
+# --- RESET DENTRO DA PÁGINA (sem cliques pela UI) ---
+# Clica Clear e confirma o modal direto no DOM. Com o conteúdo dos slots vazios (capturado pelo PoolDePaginas),
+# espera os registros voltarem a ele. Devolve "ok", "fora_do_nivel" (sem Clear ou sem slot visível: outra tela
+# do jogo), "registros_com_comandos" (Clear ignorado ou modal que não confirmou a tempo) ou "mensagem_na_tela"
+# (texto de sucesso/batida continua aparecendo depois do Clear)
+SCRIPT_RESET_EM_PAGINA = """async ([seletorClear, seletorConfirmar, seletoresSlot, vazios, esperaMs, padraoSucesso, padraoFalha]) => {
+    const botao = document.querySelector(seletorClear), slot = document.querySelector(seletoresSlot[0]);
+    if (!botao || !slot || slot.offsetParent === null) return "fora_do_nivel"; // Elementos de outras telas ficam no DOM, escondidos
+    const vazio = () => seletoresSlot.every((seletor, i) => { const s = document.querySelector(seletor); return s && s.outerHTML === vazios[i]; });
+    const tinhaComandos = vazios !== null && !vazio();
+    botao.click();
+    // O modal pode surgir com animação (ou nem surgir, se não há o que limpar); com comandos, espera os slots esvaziarem
+    let confirmou = false;
+    for (const limite = performance.now() + (tinhaComandos ? esperaMs : 300); performance.now() < limite; await new Promise(resolve => setTimeout(resolve, 30))) {
+        const confirmar = document.querySelector(seletorConfirmar);
+        if (!confirmou && confirmar && confirmar.offsetParent !== null) { confirmar.click(); confirmou = true; }
+        if (tinhaComandos ? vazio() : confirmou) break;
+    }
+    if (vazios !== null && !vazio()) return "registros_com_comandos";
+    window.__desfechoCargoBot = null; // Referência da detecção de desfecho é refeita no próximo Play
+    const texto = document.body.innerText;
+    if ([padraoSucesso, padraoFalha].some(padrao => padrao && new RegExp(padrao, "i").test(texto))) return "mensagem_na_tela";
+    return "ok";
+}"""
+SCRIPT_CONTEUDO_SLOTS = "seletores => seletores.map(seletor => { const slot = document.querySelector(seletor); return slot ? slot.outerHTML : null; })"
+TIMEOUT_RESET_REGISTROS_MS = 2000
+SCRIPT_CAPTURAR_STORAGE = "() => ({local: Object.assign({}, localStorage), sessao: Object.assign({}, sessionStorage)})"
+SCRIPT_RESTAURAR_STORAGE = """estado => {
+    localStorage.clear(); sessionStorage.clear();
+    for (const [chave, valor] of Object.entries(estado.local)) localStorage.setItem(chave, valor);
+    for (const [chave, valor] of Object.entries(estado.sessao)) sessionStorage.setItem(chave, valor);
+}"""
+
+# --- DETECÇÃO DO DESFECHO DA EXECUÇÃO ---
+PADRAO_TEXTO_SUCESSO = r"YOU GOT IT"
+# Batida/erro: a mensagem que o site real mostra ainda não foi confirmada (procurar no espelho com
+# 'python espelho_cargobot.py procurar'), então a detecção por texto fica desligada e uma batida cai em
+# "terminou_sem_sucesso" pela janela de estabilidade (ou em "tempo_esgotado"). AGENTES_PADRAO_FALHA=<regex> a liga.
+PADRAO_TEXTO_FALHA = os.environ.get("AGENTES_PADRAO_FALHA") or None
+JANELA_ESTABILIDADE_S = 3.0 # Tabuleiro parado por esse tempo, depois de ter mexido, = programa terminou sem vencer
+INTERVALO_POLLING_DESFECHO_MS = 250
+# Avaliado logo antes do clique no Play: instantâneo do texto e do DOM que a detecção usa como referência
+SCRIPT_MARCAR_PLAY = """([padraoSucesso, padraoFalha]) => {
+    const texto = document.body ? document.body.innerText : "";
+    const ocorrencias = padrao => padrao ? (texto.match(new RegExp(padrao, "gi")) || []).length : 0; // padraoFalha pode ser null
+    window.__desfechoCargoBot = {sucesso: ocorrencias(padraoSucesso), falha: ocorrencias(padraoFalha),
+                                 estado: document.body ? document.body.innerHTML : "", mudou: false, desde: performance.now()};
+}"""
+# Avaliado no navegador a cada polling; devolve o desfecho assim que o jogo o revela (ou false para continuar esperando).
+# Só vale texto que surgiu depois do Play: mensagens de tentativas (ou agentes) anteriores na mesma página não contam.
+SCRIPT_DETECTAR_DESFECHO = """([padraoSucesso, padraoFalha, janelaMs]) => {
+    const texto = document.body ? document.body.innerText : "";
+    const estado = document.body ? document.body.innerHTML : "";
+    const agora = performance.now();
+    const ocorrencias = padrao => padrao ? (texto.match(new RegExp(padrao, "gi")) || []).length : 0;
+    let marca = window.__desfechoCargoBot;
+    if (!marca) marca = window.__desfechoCargoBot = {sucesso: ocorrencias(padraoSucesso), falha: ocorrencias(padraoFalha), estado: estado, mudou: false, desde: agora};
+    const sucesso = ocorrencias(padraoSucesso), falha = ocorrencias(padraoFalha);
+    if (sucesso > marca.sucesso) return "sucesso";
+    if (falha > marca.falha) return "falha";
+    marca.sucesso = Math.min(marca.sucesso, sucesso); marca.falha = Math.min(marca.falha, falha); // Mensagem velha que sumiu e voltou é nova
+    if (estado !== marca.estado) { marca.estado = estado; marca.mudou = true; marca.desde = agora; return false; }
+    // Sem nenhuma mudança desde o Play o jogo pode nem ter começado: a janela de estabilidade só conta depois da primeira
+    return marca.mudou && agora - marca.desde >= janelaMs ? "terminou_sem_sucesso" : false;
+}"""
 
 COMANDOS_BASICOS_PALETA = [
     (SELETOR_CMD_BAIXO, "Baixo"), (SELETOR_CMD_DIREITA, "Direita"), (SELETOR_CMD_ESQUERDA, "Esquerda")
@@ -31,335 +135,778 @@ COMANDOS_FUNCAO_PALETA = [
     (SELETOR_CMD_F3_PALETA, "Chamar F3"), (SELETOR_CMD_F4_PALETA, "Chamar F4")
 ]
 TODOS_COMANDOS_TOOLBOX = COMANDOS_BASICOS_PALETA + COMANDOS_FUNCAO_PALETA # Todos os ícones da toolbox que podemos arrastar
+# Forma canônica do programa (independente do nome que cada persona usa no log)
+COMANDO_POR_SELETOR_PALETA = {
+    SELETOR_CMD_BAIXO: CMD_PEGAR_SOLTAR, SELETOR_CMD_DIREITA: CMD_DIREITA, SELETOR_CMD_ESQUERDA: CMD_ESQUERDA,
+    SELETOR_CMD_F1_PALETA: CMD_CHAMAR["f1"], SELETOR_CMD_F2_PALETA: CMD_CHAMAR["f2"],
+    SELETOR_CMD_F3_PALETA: CMD_CHAMAR["f3"], SELETOR_CMD_F4_PALETA: CMD_CHAMAR["f4"],
+}
+REGISTRO_SLOT_POR_SELETOR = {
+    seletor: (f"f{num_funcao}", indice)
+    for num_funcao, slots in enumerate((F1_SLOTS, F2_SLOTS, F3_SLOTS, F4_SLOTS), start=1)
+    for indice, seletor in enumerate(slots)
+}
+
+# --- PRIMITIVAS DE I/O DE CADA BACKEND ---
+# Os passos do BaseAgent são escritos uma vez só, como 'async def', e só falam com a página por estas primitivas.
+# PaginaSincrona chama a API síncrona do Playwright e nunca suspende, então _rodar_sincrono leva a corrotina
+# até o fim sem event loop; PaginaAsync aguarda a API async e divide um event loop com os outros agentes.
+def _rodar_sincrono(corrotina):
+    try: corrotina.send(None)
+    except StopIteration as fim: return fim.value
+    corrotina.close()
+    raise RuntimeError("Passo suspendeu fora de um event loop: com páginas async use 'await agente.executar()'")
+
+class PaginaSincrona:
+    def __init__(self, page):
+        self.page = page
+        self.slots_vazios = None # Conteúdo dos slots com os registros vazios, capturado pelo PoolDePaginas
+
+    @classmethod
+    async def abrir(cls, browser, espelho=None):
+        # Cada página ganha seu próprio contexto (cookies, storage e cache separados)
+        contexto = browser.new_context()
+        if espelho is not None: espelho.instalar(contexto) # Site servido do espelho local em vez da rede
+        return cls(contexto.new_page())
+
+    @property
+    def url(self): return self.page.url
+    async def ir_para(self, url): self.page.goto(url, timeout=60000, wait_until="domcontentloaded")
+    async def clicar(self, seletor, timeout): self.page.locator(seletor).click(timeout=timeout)
+    async def esperar_visivel(self, seletor, timeout): self.page.locator(seletor).wait_for(timeout=timeout, state="visible")
+    async def arrastar(self, seletor_origem, seletor_destino, timeout): self.page.locator(seletor_origem).drag_to(self.page.locator(seletor_destino), timeout=timeout)
+    async def arrastar_pelo_mouse(self, origem, destino):
+        self.page.mouse.move(*origem); self.page.mouse.down()
+        self.page.mouse.move(*destino); self.page.mouse.up()
+    async def avaliar(self, script, arg=None): return self.page.evaluate(script, arg)
+    async def esperar_funcao(self, script, arg, polling, timeout): return self.page.wait_for_function(script, arg=arg, polling=polling, timeout=timeout).json_value()
+    async def dormir(self, segundos): time.sleep(segundos)
+    async def fechar(self): self.page.context.close()
+
+class PaginaAsync(PaginaSincrona):
+    @classmethod
+    async def abrir(cls, browser, espelho=None):
+        contexto = await browser.new_context()
+        if espelho is not None: await espelho.instalar_async(contexto)
+        return cls(await contexto.new_page())
+
+    async def ir_para(self, url): await self.page.goto(url, timeout=60000, wait_until="domcontentloaded")
+    async def clicar(self, seletor, timeout): await self.page.locator(seletor).click(timeout=timeout)
+    async def esperar_visivel(self, seletor, timeout): await self.page.locator(seletor).wait_for(timeout=timeout, state="visible")
+    async def arrastar(self, seletor_origem, seletor_destino, timeout): await self.page.locator(seletor_origem).drag_to(self.page.locator(seletor_destino), timeout=timeout)
+    async def arrastar_pelo_mouse(self, origem, destino):
+        await self.page.mouse.move(*origem); await self.page.mouse.down()
+        await self.page.mouse.move(*destino); await self.page.mouse.up()
+    async def avaliar(self, script, arg=None): return await self.page.evaluate(script, arg)
+    async def esperar_funcao(self, script, arg, polling, timeout): return await (await self.page.wait_for_function(script, arg=arg, polling=polling, timeout=timeout)).json_value()
+    async def dormir(self, segundos): await asyncio.sleep(segundos)
+    async def fechar(self): await self.page.context.close()
+
+def _args_reset_em_pagina(slots_vazios):
+    # Do SCRIPT_RESET_EM_PAGINA; slots_vazios None (conteúdo vazio ainda não capturado) pula a conferência dos registros
+    return [SELETOR_BTN_CLEAR_JOGO, SELETOR_DOM_CONFIRMAR_CLEAR, TODOS_SLOTS, slots_vazios, TIMEOUT_RESET_REGISTROS_MS, PADRAO_TEXTO_SUCESSO, PADRAO_TEXTO_FALHA]
+
+def _classe_de_pagina(objeto):
+    # Page ou Browser do Playwright: na API async os métodos são corrotinas
+    metodo = getattr(objeto, "goto", None) or getattr(objeto, "new_context", None)
+    return PaginaAsync if inspect.iscoroutinefunction(metodo) else PaginaSincrona
+
+# Passos que uma persona chama. Persona escrita contra a API síncrona (logica_da_persona_para_tentativa sem
+# 'async', passos chamados sem 'await') continua funcionando: enquanto ela roda, cada passo chamado por ela é
+# levado até o fim na hora e devolve o valor; os passos chamados por dentro de outro passo seguem aguardados.
+PASSOS_DA_PERSONA = ("_pensar", "arrastar_para_slot", "carregar_programa", "clicar_play_jogo", "clicar_clear_jogo",
+                     "navegar_para_nivel", "_verificar_sucesso_nivel")
+
+def _passo(metodo):
+    @functools.wraps(metodo)
+    def passo(self, *args, **kwargs):
+        corrotina = metodo(self, *args, **kwargs)
+        if not self._persona_sincrona: return corrotina
+        self._persona_sincrona = False
+        try: return _rodar_sincrono(corrotina)
+        finally: self._persona_sincrona = True
+    return passo
 
 # Classe Base do Agente (como antes, com __init__ corrigido)
 class BaseAgent:
-    def __init__(self, page, nome_agente, slow_mo_factor=1.0, max_tentativas=3, log_folder="agent_default_logs"):
-        self.page = page
+    BACKEND = "navegador" # Separa as entradas do cache de desfechos por backend
+
+    def __init_subclass__(cls, **kwargs):
+        # Backends e personas que sobrescrevem um passo ganham o mesmo embrulho do BaseAgent
+        super().__init_subclass__(**kwargs)
+        for nome in PASSOS_DA_PERSONA:
+            if inspect.iscoroutinefunction(cls.__dict__.get(nome)): setattr(cls, nome, _passo(cls.__dict__[nome]))
+
+    def __init__(self, page, nome_agente, slow_mo_factor=1.0, max_tentativas=3, log_folder="agent_default_logs", relogio_virtual=False, semente=None, seletor_nivel=SELETOR_NIVEL_ALVO, carga_rapida=False, pagina_no_nivel=False, reset_em_pagina=False, verbosidade_console=VERBOSIDADE_COMPLETO, medir_latencias=False, cache_desfechos=None):
+        # page: Page do Playwright (síncrona ou async) ou uma PaginaSincrona/PaginaAsync já pronta (PoolDePaginas)
+        self.io = page if isinstance(page, PaginaSincrona) else _classe_de_pagina(page)(page)
+        self.page = self.io.page
+        self.seletor_nivel = seletor_nivel
+        self.carga_rapida = carga_rapida # Se True, carregar_programa preenche tudo de uma vez em vez de arrastar slot a slot
+        self.pagina_no_nivel = pagina_no_nivel # Página veio de um PoolDePaginas: já está no nível, com registros vazios
+        self.reset_em_pagina = reset_em_pagina # Clear feito por script na página, sem clicar pela UI
         self.nome_agente = nome_agente.replace(" ", "_") 
         self.slow_mo_factor = slow_mo_factor
         self.max_tentativas = max_tentativas
         self.tentativa_atual = 0
-        self.log_acoes = []
+        self._persona_sincrona = False # True só enquanto roda uma logica_da_persona_para_tentativa síncrona (ver _passo)
+        self.relogio_virtual = relogio_virtual # Se True, o tempo de "pensar" é somado ao relógio em vez de dormido
+        self.tempo_virtual_acumulado_s = 0.0
+        self.rng = random.Random(semente) # Semente fixa = mesmas escolhas e tempos de hesitação a cada execução
+        self.medidor = MedidorLatencias() if medir_latencias else MedidorDesligado() # Histogramas por operação (latencias.py)
+        self.cache = CacheDeDesfechos(cache_desfechos) if cache_desfechos else None # Caminho do SQLite com desfechos já vistos
         self.metricas_gerais = {
             "nome_agente": self.nome_agente, "tempo_total_inicio": time.time(),
             "tempo_total_fim": None, "duracao_total_s": None,
             "nivel_resolvido_final": False, "total_tentativas_feitas": 0,
             "total_cliques_play": 0, "total_usos_clear": 0,
-            "total_comandos_colocados": 0, "erros_de_script": 0
+            "total_comandos_colocados": 0, "erros_de_script": 0,
+            "total_execucoes_do_cache": 0
         }
         self.agent_specific_log_folder = log_folder
         self.log_file_path = os.path.join(self.agent_specific_log_folder, f"log_{self.nome_agente}.txt")
-        with open(self.log_file_path, "w", encoding="utf-8") as f:
-            f.write(f"--- INÍCIO DO LOG PARA AGENTE: {self.nome_agente} ---\n")
+        self.eventos_file_path = os.path.join(self.agent_specific_log_folder, f"eventos_{self.nome_agente}.jsonl")
+        self.registro = RegistroEventos(self.eventos_file_path, self.log_file_path, verbosidade=verbosidade_console,
+                                        cabecalho=f"--- INÍCIO DO LOG PARA AGENTE: {self.nome_agente} ---")
+        self.log_acoes = self.registro.memoria # Só as últimas linhas; o log completo fica nos arquivos
         self._resetar_metricas_tentativa()
 
     def _resetar_metricas_tentativa(self):
+        self._programa_em_execucao = None # (chave, desfecho do cache ou None) entre o Play e a verificação
         self.metricas_tentativa = {
             "comandos_colocados_nesta_tentativa": 0, "cliques_play_nesta_tentativa": 0,
             "programa_f1": [None]*len(F1_SLOTS), "programa_f2": [None]*len(F2_SLOTS),
             "programa_f3": [None]*len(F3_SLOTS), "programa_f4": [None]*len(F4_SLOTS),
+            # Mesmo programa em comandos do jogo (não nomes de log): é o que identifica o programa no cache
+            "programa_canonico": {"f1": [None]*len(F1_SLOTS), "f2": [None]*len(F2_SLOTS), "f3": [None]*len(F3_SLOTS), "f4": [None]*len(F4_SLOTS)},
         }
 
-    def _log(self, acao, tipo="INFO"):
-        timestamp_total = time.time() - self.metricas_gerais["tempo_total_inicio"]
+    def _agora(self):
+        # Tempo "equivalente humano": relógio real mais o tempo de pensar que foi pulado no modo virtual
+        return time.time() + self.tempo_virtual_acumulado_s
+
+    def _log(self, acao, tipo="INFO", seletor=None, latencia_s=None, operacao=None):
+        # tipo é a severidade/categoria do evento; operacao diz o que o agente estava fazendo (nomes de latencias.OPERACOES,
+        # mais "tentativa", "sessao" e "persona"), para filtrar os eventos sem interpretar o texto de acao
+        agora = self._agora()
+        timestamp_total = agora - self.metricas_gerais["tempo_total_inicio"]
         entrada_log = f"{timestamp_total:.2f}s [{tipo}] - {self.nome_agente} (Tentativa {self.tentativa_atual}): {acao}"
-        print(entrada_log)
-        self.log_acoes.append(entrada_log)
-        try:
-            with open(self.log_file_path, "a", encoding="utf-8") as f:
-                f.write(entrada_log + "\n")
-        except Exception as e_log_write: print(f"!!! ERRO AO ESCREVER LOG {self.log_file_path}: {e_log_write}")
+        evento = {"timestamp": round(agora, 3), "t_s": round(timestamp_total, 3), "agente": self.nome_agente,
+                  "tentativa": self.tentativa_atual, "tipo": tipo, "operacao": operacao, "acao": acao, "seletor": seletor,
+                  "latencia_s": None if latencia_s is None else round(latencia_s, 4)}
+        self.registro.registrar(evento, entrada_log)
+
+    def _sortear_tempo_pensar(self, segundos_base):
+        return segundos_base * self.slow_mo_factor * self.rng.uniform(0.7, 1.3)
+
+    def _duracao_pensar(self, segundos_base):
+        duracao = self._sortear_tempo_pensar(segundos_base)
+        self.medidor.registrar_pensar(duracao, dormido=not self.relogio_virtual)
+        if self.relogio_virtual: self.tempo_virtual_acumulado_s += duracao; return 0
+        return duracao
 
-    def _pensar(self, segundos_base=1):
-        time.sleep(segundos_base * self.slow_mo_factor * random.uniform(0.7, 1.3))
+    @_passo
+    async def _pensar(self, segundos_base=1):
+        duracao = self._duracao_pensar(segundos_base)
+        if duracao: await self.io.dormir(duracao)
 
-    def arrastar_para_slot(self, seletor_comando_paleta, seletor_slot_destino, nome_comando_log="Comando", func_slot_info=None):
-        self._log(f"Tentando arrastar '{nome_comando_log}' ({seletor_comando_paleta}) para slot '{seletor_slot_destino}'")
+    def _contabilizar_comando_colocado(self, func_slot_info, seletor_paleta=None, seletor_slot=None):
+        self.metricas_gerais["total_comandos_colocados"] += 1
+        self.metricas_tentativa["comandos_colocados_nesta_tentativa"] += 1
+        if seletor_paleta in COMANDO_POR_SELETOR_PALETA and seletor_slot in REGISTRO_SLOT_POR_SELETOR:
+            registro, indice = REGISTRO_SLOT_POR_SELETOR[seletor_slot]
+            self.metricas_tentativa["programa_canonico"][registro][indice] = COMANDO_POR_SELETOR_PALETA[seletor_paleta]
+        if func_slot_info:
+            func_name_key, slot_idx, cmd_real = func_slot_info
+            if func_name_key in self.metricas_tentativa and slot_idx < len(self.metricas_tentativa[func_name_key]):
+                self.metricas_tentativa[func_name_key][slot_idx] = cmd_real
+
+    @_passo
+    async def arrastar_para_slot(self, seletor_comando_paleta, seletor_slot_destino, nome_comando_log="Comando", func_slot_info=None):
+        self._log(f"Tentando arrastar '{nome_comando_log}' ({seletor_comando_paleta}) para slot '{seletor_slot_destino}'", seletor=seletor_slot_destino, operacao="drag_to")
+        inicio = time.perf_counter()
         try:
-            comando_a_arrastar = self.page.locator(seletor_comando_paleta)
-            slot_alvo = self.page.locator(seletor_slot_destino)
-            comando_a_arrastar.wait_for(timeout=5000, state="visible")
-            slot_alvo.wait_for(timeout=5000, state="visible")
-            comando_a_arrastar.drag_to(slot_alvo, timeout=5000)
-            self.metricas_gerais["total_comandos_colocados"] += 1
-            self.metricas_tentativa["comandos_colocados_nesta_tentativa"] += 1
-            if func_slot_info:
-                func_name_key, slot_idx, cmd_real = func_slot_info
-                if func_name_key in self.metricas_tentativa and slot_idx < len(self.metricas_tentativa[func_name_key]):
-                    self.metricas_tentativa[func_name_key][slot_idx] = cmd_real
-            self._log(f"SUCESSO: '{nome_comando_log}' arrastado para '{seletor_slot_destino}'.")
+            with self.medidor.medir("espera_locator"):
+                await self.io.esperar_visivel(seletor_comando_paleta, 5000)
+                await self.io.esperar_visivel(seletor_slot_destino, 5000)
+            with self.medidor.medir("drag_to"): await self.io.arrastar(seletor_comando_paleta, seletor_slot_destino, 5000)
+            self._contabilizar_comando_colocado(func_slot_info, seletor_comando_paleta, seletor_slot_destino)
+            self._log(f"SUCESSO: '{nome_comando_log}' arrastado para '{seletor_slot_destino}'.", seletor=seletor_slot_destino, latencia_s=time.perf_counter() - inicio, operacao="drag_to")
         except Exception as e:
-            self._log(f"ERRO AO ARRASTAR '{nome_comando_log}' para '{seletor_slot_destino}': {e}", tipo="SCRIPT_ERROR")
+            self._log(f"ERRO AO ARRASTAR '{nome_comando_log}' para '{seletor_slot_destino}': {e}", tipo="SCRIPT_ERROR", seletor=seletor_slot_destino, latencia_s=time.perf_counter() - inicio, operacao="drag_to")
             self.metricas_gerais["erros_de_script"] += 1
             raise 
-        self._pensar(0.1 * self.slow_mo_factor)
+        await self._pensar(0.1 * self.slow_mo_factor)
+
+    def _comandos_do_programa(self, programa):
+        # programa: {"programa_f1": [(seletor_paleta, nome_log), ...], ...}, preenchido a partir do slot 0
+        return [(seletor_paleta, SLOTS_POR_PROGRAMA[chave][i], nome_log, (chave, i, nome_log))
+                for chave, comandos in programa.items() for i, (seletor_paleta, nome_log) in enumerate(comandos)]
+
+    def _creditar_pensar_da_carga(self, comandos):
+        # A carga em lote pula as pausas entre arrastes; no relógio virtual elas entram na conta (mesmo sorteio do modo fiel).
+        # O sorteio é feito nos dois modos para a semente seguir alinhada com a carga arraste a arraste
+        for _ in comandos:
+            duracao = self._sortear_tempo_pensar(0.1 * self.slow_mo_factor)
+            if not self.relogio_virtual: continue
+            self.medidor.registrar_pensar(duracao, dormido=False)
+            self.tempo_virtual_acumulado_s += duracao
+
+    @_passo
+    async def carregar_programa(self, programa):
+        comandos = self._comandos_do_programa(programa)
+        if not self.carga_rapida:
+            for seletor_paleta, seletor_slot, nome_log, func_slot_info in comandos: await self.arrastar_para_slot(seletor_paleta, seletor_slot, nome_log, func_slot_info)
+            return
+        await self._carregar_programa_em_lote(comandos)
+
+    async def _carregar_programa_em_lote(self, comandos):
+        self._log(f"Carga rápida: colocando {len(comandos)} comandos de uma vez...", operacao="carga_rapida")
+        inicio = time.perf_counter()
+        try:
+            por_registro = {} # Um registro por vez na tela
+            for comando in comandos: por_registro.setdefault(comando[3][0], []).append(comando)
+            seletores_slot, conteudo_antes = [], []
+            with self.medidor.medir("carga_rapida"):
+                for comandos_registro in por_registro.values():
+                    paletas, slots = [c[0] for c in comandos_registro], [c[1] for c in comandos_registro]
+                    preparo = await self.io.avaliar(SCRIPT_PREPARAR_CARGA, [paletas, slots])
+                    centros = dict(zip(paletas + slots, preparo["centros"]))
+                    for seletor_paleta, seletor_slot, nome_log, _ in comandos_registro:
+                        if centros[seletor_paleta] is None or centros[seletor_slot] is None: raise ValueError(f"Elemento não encontrado ou fora da tela para '{nome_log}' -> '{seletor_slot}'")
+                        await self.io.arrastar_pelo_mouse(centros[seletor_paleta], centros[seletor_slot])
+                    seletores_slot += slots; conteudo_antes += preparo["conteudo"]
+                # Confere nos registros o que de fato chegou antes de contabilizar qualquer comando
+                try: await self.io.esperar_funcao(SCRIPT_CARGA_CONFIRMADA, [seletores_slot, conteudo_antes], 100, TIMEOUT_CONFIRMAR_CARGA_MS)
+                except PlaywrightTimeoutError:
+                    faltando = await self.io.avaliar(SCRIPT_SLOTS_SEM_MUDANCA, [seletores_slot, conteudo_antes])
+                    raise ValueError(f"Carga rápida não chegou a {len(faltando)} slot(s): {', '.join(faltando)}")
+            for seletor_paleta, seletor_slot, nome_log, func_slot_info in comandos: self._contabilizar_comando_colocado(func_slot_info, seletor_paleta, seletor_slot)
+            self._log(f"SUCESSO: {len(comandos)} comandos colocados na carga rápida.", latencia_s=time.perf_counter() - inicio, operacao="carga_rapida")
+        except Exception as e:
+            self._log(f"ERRO NA CARGA RÁPIDA DO PROGRAMA: {e}", tipo="SCRIPT_ERROR", operacao="carga_rapida")
+            self.metricas_gerais["erros_de_script"] += 1
+            raise
+        self._creditar_pensar_da_carga(comandos)
+
+    def _consultar_cache_no_play(self):
+        # Chamado por todo clicar_play_jogo: True quando o programa já foi avaliado e o Play real pode ser pulado
+        if self.cache is None: return False
+        chave = chave_do_programa(self.BACKEND, self.seletor_nivel, self.metricas_tentativa["programa_canonico"])
+        em_cache = self.cache.consultar(chave)
+        self._programa_em_execucao = (chave, em_cache)
+        if em_cache is None: return False
+        self.metricas_gerais["total_cliques_play"] += 1
+        self.metricas_tentativa["cliques_play_nesta_tentativa"] += 1
+        self.metricas_gerais["total_execucoes_do_cache"] += 1
+        self.metricas_tentativa["desfecho_do_cache"] = True
+        self._log(f"Programa já avaliado neste nível (cache): '{em_cache['desfecho']}'. Play real pulado.", operacao="clique_play")
+        return True
+
+    def _desfecho_do_cache_pendente(self):
+        # Chamado no início de todo _verificar_sucesso_nivel: consome o desfecho achado no Play, se houver
+        if self._programa_em_execucao is None or self._programa_em_execucao[1] is None: return None
+        em_cache, self._programa_em_execucao = self._programa_em_execucao[1], None
+        inicio_observacao = self._agora()
+        if self.relogio_virtual: self.tempo_virtual_acumulado_s += em_cache["tempo_execucao_s"] # Tempo que o aluno passaria olhando o jogo rodar
+        return self._registrar_desfecho(em_cache["desfecho"], inicio_observacao, observado=False)
 
-    def clicar_play_jogo(self):
-        self._log("Clicando no Play do Jogo...")
-        self.page.locator(SELETOR_BTN_PLAY_JOGO).click(timeout=5000)
+    @_passo
+    async def clicar_play_jogo(self):
+        if self._consultar_cache_no_play(): return
+        self._log("Clicando no Play do Jogo...", operacao="clique_play")
+        inicio = time.perf_counter()
+        with self.medidor.medir("clique_play"):
+            await self.io.avaliar(SCRIPT_MARCAR_PLAY, [PADRAO_TEXTO_SUCESSO, PADRAO_TEXTO_FALHA])
+            await self.io.clicar(SELETOR_BTN_PLAY_JOGO, 5000)
         self.metricas_gerais["total_cliques_play"] += 1
         self.metricas_tentativa["cliques_play_nesta_tentativa"] += 1
-        self._log("Play do Jogo clicado.")
+        self._log("Play do Jogo clicado.", seletor=SELETOR_BTN_PLAY_JOGO, latencia_s=time.perf_counter() - inicio, operacao="clique_play")
 
-    def clicar_clear_jogo(self):
-        self._log("Clicando no Clear do Jogo...")
+    @_passo
+    async def clicar_clear_jogo(self):
+        self._log("Clicando no Clear do Jogo...", operacao="clear")
         try:
-            self.page.locator(SELETOR_BTN_CLEAR_JOGO).click(timeout=7000)
-            self._log("Botão Clear principal clicado.")
-            self.page.locator(MODAL_CLEAR_CONFIRM_SELECTOR).click(timeout=3000) 
-            self._log("Confirmado 'CLEAR' no modal.")
-        except PlaywrightTimeoutError: self._log("Modal de confirmação Clear não apareceu (OK).")
-        except Exception as e_clear: self._log(f"Aviso: Problema ao clicar/confirmar clear: {e_clear}", tipo="SCRIPT_WARNING")
+            with self.medidor.medir("clear"):
+                if self.reset_em_pagina:
+                    estado_reset = await self.io.avaliar(SCRIPT_RESET_EM_PAGINA, _args_reset_em_pagina(self.io.slots_vazios))
+                    if estado_reset == "fora_do_nivel": raise RuntimeError("página fora do nível")
+                    if estado_reset == "registros_com_comandos": # O Clear por script não pegou: tenta pela UI
+                        self._log("Registros continuam com comandos depois do Clear na página; refazendo pela UI.", tipo="SCRIPT_WARNING", operacao="clear")
+                        await self._clicar_clear_pela_ui()
+                    else: self._log("Clear feito direto na página." if estado_reset == "ok" else "Clear feito direto na página; mensagem da execução anterior continua na tela.", operacao="clear")
+                else: await self._clicar_clear_pela_ui()
+        except Exception as e_clear: self._log(f"Aviso: Problema ao clicar/confirmar clear: {e_clear}", tipo="SCRIPT_WARNING", operacao="clear")
         self.metricas_gerais["total_usos_clear"] += 1
         self._resetar_metricas_tentativa() 
-        self._pensar(0.3)
-
-    def navegar_para_nivel(self):
-        self._log(f"Navegando para o nível {SELETOR_NIVEL_ALVO}...")
-        self.page.goto(CARGOBOT_BASE_URL, timeout=60000, wait_until="domcontentloaded") 
-        self._pensar(1.5)
-        self.page.locator(SELETOR_START_THE_GAME).click(timeout=15000); self._pensar(0.3)
-        self.page.locator(SELETOR_PACOTE_EASY).click(timeout=15000); self._pensar(0.3)  
-        self.page.locator(SELETOR_NIVEL_ALVO).click(timeout=15000)
-        self._log(f"Navegação para '{SELETOR_NIVEL_ALVO}' completa. URL: {self.page.url}") 
-        self._pensar(2.5) 
-
-    def _verificar_sucesso_nivel(self, tempo_execucao_jogo=5): 
-        self._log(f"Observando execução do jogo por {tempo_execucao_jogo}s para verificar sucesso...")
-        self._pensar(tempo_execucao_jogo) 
+        await self._pensar(0.3)
+
+    async def _clicar_clear_pela_ui(self):
         try:
-            self.page.locator("text=/YOU GOT IT/i").wait_for(timeout=1000, state="visible") 
-            self._log("Tela 'YOU GOT IT' detectada!", tipo="SUCESSO_NIVEL")
+            await self.io.clicar(SELETOR_BTN_CLEAR_JOGO, 7000)
+            self._log("Botão Clear principal clicado.", operacao="clear")
+            await self.io.clicar(MODAL_CLEAR_CONFIRM_SELECTOR, 3000) 
+            self._log("Confirmado 'CLEAR' no modal.", operacao="clear")
+        except PlaywrightTimeoutError: self._log("Modal de confirmação Clear não apareceu (OK).", operacao="clear")
+
+    @_passo
+    async def navegar_para_nivel(self):
+        self._log(f"Navegando para o nível {self.seletor_nivel}...", operacao="navegacao")
+        with self.medidor.medir("navegacao"): # As pausas de pensar no meio são descontadas pelo medidor
+            await self.io.ir_para(CARGOBOT_BASE_URL)
+            await self._pensar(1.5)
+            await self.io.clicar(SELETOR_START_THE_GAME, 15000); await self._pensar(0.3)
+            await self.io.clicar(SELETOR_PACOTE_EASY, 15000); await self._pensar(0.3)
+            await self.io.clicar(self.seletor_nivel, 15000)
+        self._log(f"Navegação para '{self.seletor_nivel}' completa. URL: {self.io.url}", operacao="navegacao") 
+        await self._pensar(2.5) 
+
+    def _argumentos_deteccao_desfecho(self):
+        return [PADRAO_TEXTO_SUCESSO, PADRAO_TEXTO_FALHA, JANELA_ESTABILIDADE_S * 1000]
+
+    def _registrar_desfecho(self, desfecho, inicio_observacao, observado=True):
+        # Guarda o desfecho na tentativa e devolve se o nível foi resolvido; observado=False (veio do cache) não é latência de verificação
+        if observado: self.medidor.registrar("verificacao", self._agora() - inicio_observacao)
+        tempo_deteccao = round(self._agora() - inicio_observacao, 2)
+        if self._programa_em_execucao is not None: # Execução real de um programa ainda fora do cache
+            self.cache.guardar(self._programa_em_execucao[0], self.seletor_nivel, desfecho, tempo_deteccao)
+            self._programa_em_execucao = None
+        self.metricas_tentativa["resultado_execucao"] = desfecho
+        self.metricas_tentativa["tempo_deteccao_s"] = tempo_deteccao
+        if desfecho == "sucesso":
+            self._log(f"Tela 'YOU GOT IT' detectada após {tempo_deteccao}s!", tipo="SUCESSO_NIVEL", latencia_s=tempo_deteccao, operacao="verificacao")
             return True
-        except PlaywrightTimeoutError:
-            self._log("Tela 'YOU GOT IT' não detectada.", tipo="FALHA_NIVEL")
-            return False
+        self._log(f"Nível não resolvido: '{desfecho}' detectado após {tempo_deteccao}s.", tipo="FALHA_NIVEL", latencia_s=tempo_deteccao, operacao="verificacao")
+        return False
+
+    @_passo
+    async def _verificar_sucesso_nivel(self, tempo_execucao_jogo=5): 
+        # tempo_execucao_jogo é só o limite: retorna assim que o jogo mostra sucesso, batida (com PADRAO_TEXTO_FALHA) ou fica parado
+        resolvido_pelo_cache = self._desfecho_do_cache_pendente()
+        if resolvido_pelo_cache is not None: return resolvido_pelo_cache
+        self._log(f"Observando execução do jogo (até {tempo_execucao_jogo}s) para verificar sucesso...", operacao="verificacao")
+        inicio_observacao = self._agora()
+        try:
+            desfecho = await self.io.esperar_funcao(SCRIPT_DETECTAR_DESFECHO, self._argumentos_deteccao_desfecho(),
+                                                    INTERVALO_POLLING_DESFECHO_MS, tempo_execucao_jogo * 1000)
+        except PlaywrightTimeoutError: desfecho = "tempo_esgotado"
+        return self._registrar_desfecho(desfecho, inicio_observacao)
 
     def finalizar_sessao_agente(self):
-        self.metricas_gerais["tempo_total_fim"] = time.time()
+        self.metricas_gerais["tempo_total_fim"] = self._agora()
         duracao = self.metricas_gerais["tempo_total_fim"] - self.metricas_gerais["tempo_total_inicio"]
         self.metricas_gerais["duracao_total_s"] = round(duracao, 2)
         self.metricas_gerais["total_tentativas_feitas"] = self.tentativa_atual
+        latencias = self.medidor.como_dict()
+        if latencias is not None: self.metricas_gerais["latencias"] = latencias
+        if self.cache is not None: self.cache.fechar()
         log_final_sessao = f"SESSÃO DO AGENTE FINALIZADA. Resolvido: {self.metricas_gerais['nivel_resolvido_final']}. Tentativas: {self.metricas_gerais['total_tentativas_feitas']}. Duração: {self.metricas_gerais['duracao_total_s']}s"
-        self._log(log_final_sessao, tipo="FINAL_SESSAO")
-        with open(self.log_file_path, "a", encoding="utf-8") as f:
-            f.write("\n--- MÉTRICAS FINAIS ---\n")
-            for chave, valor in self.metricas_gerais.items(): f.write(f"  {chave}: {valor}\n")
-            f.write("--- FIM DAS MÉTRICAS ---\n")
+        self._log(log_final_sessao, tipo="FINAL_SESSAO", operacao="sessao")
+        self.registro.escrever_texto("\n--- MÉTRICAS FINAIS ---")
+        for chave, valor in self.metricas_gerais.items(): self.registro.escrever_texto(f"  {chave}: {valor}")
+        self.registro.escrever_texto("--- FIM DAS MÉTRICAS ---")
+        self.registro.flush()
 
     def run(self):
+        # Caminho síncrono (páginas da API síncrona e simulador): o mesmo executar(), levado até o fim sem event loop
+        return _rodar_sincrono(self.executar())
+
+    async def executar(self):
+        persona_sincrona = not inspect.iscoroutinefunction(self.logica_da_persona_para_tentativa)
+        if persona_sincrona and isinstance(self.io, PaginaAsync):
+            raise TypeError(f"{type(self).__name__}.logica_da_persona_para_tentativa é síncrona: com páginas async ela precisa ser 'async def' e aguardar cada passo")
         self.tentativa_atual = 0
         try: # Try-except para a navegação, caso ela falhe.
-            self.navegar_para_nivel()
-            self.clicar_clear_jogo() 
+            if self.pagina_no_nivel: self._log(f"Página recebida já no nível {self.seletor_nivel}, com registros vazios.", operacao="sessao")
+            else:
+                await self.navegar_para_nivel()
+                await self.clicar_clear_jogo() 
         except Exception as e_nav:
-            self._log(f"ERRO FATAL DURANTE NAVEGAÇÃO OU CLEAR INICIAL: {e_nav}", tipo="FATAL_ERROR")
+            self._log(f"ERRO FATAL DURANTE NAVEGAÇÃO OU CLEAR INICIAL: {e_nav}", tipo="FATAL_ERROR", operacao="sessao")
             self.metricas_gerais["erros_de_script"] +=1
             self.finalizar_sessao_agente()
             return # Não prossegue se a navegação falhar
 
         while self.tentativa_atual < self.max_tentativas:
             self.tentativa_atual += 1
-            self._log(f"Iniciando tentativa {self.tentativa_atual}/{self.max_tentativas}")
+            self._log(f"Iniciando tentativa {self.tentativa_atual}/{self.max_tentativas}", operacao="tentativa")
             try:
-                resolvido_nesta_tentativa = self.logica_da_persona_para_tentativa()
+                resolvido_nesta_tentativa = await self._rodar_logica_da_persona(persona_sincrona)
                 if resolvido_nesta_tentativa:
                     self.metricas_gerais["nivel_resolvido_final"] = True; break 
                 elif self.tentativa_atual < self.max_tentativas:
-                    self._log("Não resolveu. Limpando para a próxima tentativa.")
-                    self.clicar_clear_jogo() 
-                else: self._log("Máximo de tentativas alcançado sem resolver.")
+                    self._log("Não resolveu. Limpando para a próxima tentativa.", operacao="tentativa")
+                    await self.clicar_clear_jogo() 
+                else: self._log("Máximo de tentativas alcançado sem resolver.", operacao="tentativa")
             except PlaywrightTimeoutError as pte: 
-                 self._log(f"ERRO DE TIMEOUT DO PLAYWRIGHT NA TENTATIVA: {pte}", tipo="SCRIPT_ERROR")
+                 self._log(f"ERRO DE TIMEOUT DO PLAYWRIGHT NA TENTATIVA: {pte}", tipo="SCRIPT_ERROR", operacao="tentativa")
                  self.metricas_gerais["erros_de_script"] += 1
-                 if self.tentativa_atual < self.max_tentativas: self.clicar_clear_jogo()
+                 if self.tentativa_atual < self.max_tentativas: await self.clicar_clear_jogo()
             except Exception as e_script: 
-                self._log(f"ERRO DE SCRIPT INESPERADO NA TENTATIVA: {e_script}", tipo="SCRIPT_ERROR")
+                self._log(f"ERRO DE SCRIPT INESPERADO NA TENTATIVA: {e_script}", tipo="SCRIPT_ERROR", operacao="tentativa")
                 self.metricas_gerais["erros_de_script"] += 1
-                if self.tentativa_atual < self.max_tentativas: self.clicar_clear_jogo()
+                if self.tentativa_atual < self.max_tentativas: await self.clicar_clear_jogo()
             if self.metricas_gerais["nivel_resolvido_final"]: break
         self.finalizar_sessao_agente()
 
-    def logica_da_persona_para_tentativa(self):
+    async def _rodar_logica_da_persona(self, persona_sincrona):
+        if not persona_sincrona: return await self.logica_da_persona_para_tentativa()
+        self._persona_sincrona = True # Passos chamados sem await rodam na hora (ver _passo)
+        try: return self.logica_da_persona_para_tentativa()
+        finally: self._persona_sincrona = False
+
+    async def logica_da_persona_para_tentativa(self):
         raise NotImplementedError("Persona deve implementar 'logica_da_persona_para_tentativa'")
 
 # --- PERSONAS ---
 
 class AgenteSolucionadorPerfeito(BaseAgent):
-    def __init__(self, page, log_folder):
-        super().__init__(page, "Aluno_Perfeito_SolucaoImagem", slow_mo_factor=0.3, max_tentativas=1, log_folder=log_folder)
-    def logica_da_persona_para_tentativa(self): # Implementa a solução humana 
-        self._log("Aplicando solução da imagem (F1->F2->F4->F3)...")
+    def __init__(self, page, log_folder, **opcoes):
+        super().__init__(page, "Aluno_Perfeito_SolucaoImagem", slow_mo_factor=0.3, max_tentativas=1, log_folder=log_folder, **opcoes)
+    async def logica_da_persona_para_tentativa(self): # Implementa a solução humana 
+        self._log("Aplicando solução da imagem (F1->F2->F4->F3)...", operacao="persona")
         try:
             # F1
             cmd_f1 = [(SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_ESQUERDA, "E"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_F2_PALETA, "F2")]
-            for i, (cs,cn) in enumerate(cmd_f1): self.arrastar_para_slot(cs, F1_SLOTS[i], cn, ("programa_f1",i,cn))
             # F2 (Chama F4)
             cmd_f2 = [(SELETOR_CMD_ESQUERDA, "E"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_ESQUERDA, "E"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_F4_PALETA, "F4")]
-            for i, (cs,cn) in enumerate(cmd_f2): self.arrastar_para_slot(cs, F2_SLOTS[i], cn, ("programa_f2",i,cn))
             # F3 (Chama F1)
             cmd_f3 = [(SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_BAIXO, "B"),(SELETOR_CMD_ESQUERDA, "E"), (SELETOR_CMD_BAIXO, "B"),(SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_BAIXO, "B"),(SELETOR_CMD_ESQUERDA, "E"), (SELETOR_CMD_F1_PALETA, "F1")]
-            for i, (cs,cn) in enumerate(cmd_f3): self.arrastar_para_slot(cs, F3_SLOTS[i], cn, ("programa_f3",i,cn))
             # F4 (Chama F3)
             cmd_f4 = [(SELETOR_CMD_DIREITA, "D"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_ESQUERDA, "E"), (SELETOR_CMD_BAIXO, "B"), (SELETOR_CMD_F3_PALETA, "F3")]
-            for i, (cs,cn) in enumerate(cmd_f4): self.arrastar_para_slot(cs, F4_SLOTS[i], cn, ("programa_f4",i,cn))
-            self.clicar_play_jogo()
-            return self._verificar_sucesso_nivel(tempo_execucao_jogo=60) 
-        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR"); return False
+            await self.carregar_programa({"programa_f1": cmd_f1, "programa_f2": cmd_f2, "programa_f3": cmd_f3, "programa_f4": cmd_f4})
+            await self.clicar_play_jogo()
+            return await self._verificar_sucesso_nivel(tempo_execucao_jogo=60) 
+        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR", operacao="persona"); return False
 
 class AgenteInicianteExplorador(BaseAgent): # Cauteloso
-    def __init__(self, page, log_folder):
-        super().__init__(page, "Aluno_Iniciante_Explorador", slow_mo_factor=1.8, max_tentativas=2, log_folder=log_folder)
-    def logica_da_persona_para_tentativa(self): # Tenta um ou dois comandos em F1 e testa
-        self._log(f"Explorador: Tentativa {self.tentativa_atual}")
+    def __init__(self, page, log_folder, **opcoes):
+        super().__init__(page, "Aluno_Iniciante_Explorador", slow_mo_factor=1.8, max_tentativas=2, log_folder=log_folder, **opcoes)
+    async def logica_da_persona_para_tentativa(self): # Tenta um ou dois comandos em F1 e testa
+        self._log(f"Explorador: Tentativa {self.tentativa_atual}", operacao="persona")
         try:
             num_cmds_to_try = 1 if self.tentativa_atual == 1 else 2
             for i in range(num_cmds_to_try):
-                cmd_s, cmd_n = random.choice(COMANDOS_BASICOS_PALETA)
-                self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
-                self._pensar(1) # Pensa entre cada comando
+                cmd_s, cmd_n = self.rng.choice(COMANDOS_BASICOS_PALETA)
+                await self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
+                await self._pensar(1) # Pensa entre cada comando
             if self.metricas_tentativa["comandos_colocados_nesta_tentativa"] > 0:
-                self.clicar_play_jogo()
-                return self._verificar_sucesso_nivel(tempo_execucao_jogo=7)
+                await self.clicar_play_jogo()
+                return await self._verificar_sucesso_nivel(tempo_execucao_jogo=7)
             return False
-        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR"); return False
+        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR", operacao="persona"); return False
 
 class AgenteImpulsivoAleatorio(BaseAgent): # Tentativa e erro rápida
-    def __init__(self, page, log_folder):
-        super().__init__(page, "Aluno_Impulsivo_Aleatorio", slow_mo_factor=0.7, max_tentativas=4, log_folder=log_folder)
-    def logica_da_persona_para_tentativa(self): # Preenche F1 aleatoriamente, talvez F2
-        self._log(f"Impulsivo: Tentativa {self.tentativa_atual}")
+    def __init__(self, page, log_folder, **opcoes):
+        super().__init__(page, "Aluno_Impulsivo_Aleatorio", slow_mo_factor=0.7, max_tentativas=4, log_folder=log_folder, **opcoes)
+    async def logica_da_persona_para_tentativa(self): # Preenche F1 aleatoriamente, talvez F2
+        self._log(f"Impulsivo: Tentativa {self.tentativa_atual}", operacao="persona")
         try:
-            for i in range(random.randint(4, len(F1_SLOTS))): # Preenche boa parte de F1
-                if random.random() < 0.15 and i == len(F1_SLOTS) -1 : # Pequena chance de chamar F2
+            for i in range(self.rng.randint(4, len(F1_SLOTS))): # Preenche boa parte de F1
+                if self.rng.random() < 0.15 and i == len(F1_SLOTS) -1 : # Pequena chance de chamar F2
                     cmd_s, cmd_n = SELETOR_CMD_F2_PALETA, "Chamar F2"
-                    self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
-                    for j in range(random.randint(1,3)): # Alguns comandos em F2
-                        cmd_s2, cmd_n2 = random.choice(COMANDOS_BASICOS_PALETA)
-                        self.arrastar_para_slot(cmd_s2, F2_SLOTS[j], cmd_n2, ("programa_f2",j,cmd_n2))
+                    await self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
+                    for j in range(self.rng.randint(1,3)): # Alguns comandos em F2
+                        cmd_s2, cmd_n2 = self.rng.choice(COMANDOS_BASICOS_PALETA)
+                        await self.arrastar_para_slot(cmd_s2, F2_SLOTS[j], cmd_n2, ("programa_f2",j,cmd_n2))
                 else:
-                    cmd_s, cmd_n = random.choice(COMANDOS_BASICOS_PALETA)
-                    self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
+                    cmd_s, cmd_n = self.rng.choice(COMANDOS_BASICOS_PALETA)
+                    await self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
             if self.metricas_tentativa["comandos_colocados_nesta_tentativa"] > 0:
-                self.clicar_play_jogo()
-            return self._verificar_sucesso_nivel(tempo_execucao_jogo=15)
-        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR"); return False
+                await self.clicar_play_jogo()
+            return await self._verificar_sucesso_nivel(tempo_execucao_jogo=15)
+        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR", operacao="persona"); return False
 
 class AgenteMetodicoF1(BaseAgent): # Tenta tudo em F1
-    def __init__(self, page, log_folder):
-        super().__init__(page, "Aluno_Metodico_F1", slow_mo_factor=1.2, max_tentativas=2, log_folder=log_folder)
-    def logica_da_persona_para_tentativa(self):
-        self._log(f"Metódico F1: Tentativa {self.tentativa_atual}")
+    def __init__(self, page, log_folder, **opcoes):
+        super().__init__(page, "Aluno_Metodico_F1", slow_mo_factor=1.2, max_tentativas=2, log_folder=log_folder, **opcoes)
+    async def logica_da_persona_para_tentativa(self):
+        self._log(f"Metódico F1: Tentativa {self.tentativa_atual}", operacao="persona")
         # Tenta construir uma solução mais longa apenas em F1
         # (Lógica de exemplo: tenta mover 3 blocos de C1 para C3, um por vez, usando C2 como temp)
         # Esta lógica é para o Double Flip CLÁSSICO de 3 blocos, só para exemplo de comportamento.
         # Não vai resolver o nível atual de 4 blocos.
         try:
             # Mover 1º bloco (topo de C1) para C2
-            self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[0], "Pega1",("programa_f1",0,"Pega1"))
-            self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[1], "Dir1",("programa_f1",1,"Dir1"))
-            self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[2], "Larga1",("programa_f1",2,"Larga1"))
+            await self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[0], "Pega1",("programa_f1",0,"Pega1"))
+            await self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[1], "Dir1",("programa_f1",1,"Dir1"))
+            await self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[2], "Larga1",("programa_f1",2,"Larga1"))
             if self.tentativa_atual == 1: # Na primeira tentativa, testa só isso
-                self.clicar_play_jogo()
-                if self._verificar_sucesso_nivel(5) : return True
-                self.clicar_clear_jogo() # Limpa para a próxima etapa da sua lógica
+                await self.clicar_play_jogo()
+                if await self._verificar_sucesso_nivel(5) : return True
+                await self.clicar_clear_jogo() # Limpa para a próxima etapa da sua lógica
                 # Precisa arrastar novamente se limpou
-                self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[0], "Pega1",("programa_f1",0,"Pega1"))
-                self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[1], "Dir1",("programa_f1",1,"Dir1"))
-                self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[2], "Larga1",("programa_f1",2,"Larga1"))
+                await self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[0], "Pega1",("programa_f1",0,"Pega1"))
+                await self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[1], "Dir1",("programa_f1",1,"Dir1"))
+                await self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[2], "Larga1",("programa_f1",2,"Larga1"))
 
             # Mover 2º bloco (meio de C1) para C3
-            self.arrastar_para_slot(SELETOR_CMD_ESQUERDA, F1_SLOTS[3], "Esq1",("programa_f1",3,"Esq1"))
-            self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[4], "Pega2",("programa_f1",4,"Pega2"))
-            self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[5], "Dir2",("programa_f1",5,"Dir2"))
-            self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[6], "Dir3",("programa_f1",6,"Dir3"))
-            self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[7], "Larga2",("programa_f1",7,"Larga2"))
+            await self.arrastar_para_slot(SELETOR_CMD_ESQUERDA, F1_SLOTS[3], "Esq1",("programa_f1",3,"Esq1"))
+            await self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[4], "Pega2",("programa_f1",4,"Pega2"))
+            await self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[5], "Dir2",("programa_f1",5,"Dir2"))
+            await self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[6], "Dir3",("programa_f1",6,"Dir3"))
+            await self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[7], "Larga2",("programa_f1",7,"Larga2"))
             
-            self.clicar_play_jogo()
-            return self._verificar_sucesso_nivel(tempo_execucao_jogo=20)
-        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR"); return False
+            await self.clicar_play_jogo()
+            return await self._verificar_sucesso_nivel(tempo_execucao_jogo=20)
+        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR", operacao="persona"); return False
 
 class AgenteConfusoComChamadas(BaseAgent):
-    def __init__(self, page, log_folder):
-        super().__init__(page, "Aluno_Confuso_Chamadas", slow_mo_factor=1.5, max_tentativas=2, log_folder=log_folder)
-    def logica_da_persona_para_tentativa(self):
-        self._log(f"Confuso Chamadas: Tentativa {self.tentativa_atual}")
+    def __init__(self, page, log_folder, **opcoes):
+        super().__init__(page, "Aluno_Confuso_Chamadas", slow_mo_factor=1.5, max_tentativas=2, log_folder=log_folder, **opcoes)
+    async def logica_da_persona_para_tentativa(self):
+        self._log(f"Confuso Chamadas: Tentativa {self.tentativa_atual}", operacao="persona")
         # Tenta usar F1 e F2, mas pode errar a chamada
         try:
             # F1 - alguns comandos
-            for i in range(random.randint(2,4)):
-                cmd_s, cmd_n = random.choice(COMANDOS_BASICOS_PALETA)
-                self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
+            for i in range(self.rng.randint(2,4)):
+                cmd_s, cmd_n = self.rng.choice(COMANDOS_BASICOS_PALETA)
+                await self.arrastar_para_slot(cmd_s, F1_SLOTS[i], cmd_n, ("programa_f1",i,cmd_n))
             
             # F2 - alguns comandos
-            for i in range(random.randint(2,4)):
-                cmd_s, cmd_n = random.choice(COMANDOS_BASICOS_PALETA)
-                self.arrastar_para_slot(cmd_s, F2_SLOTS[i], cmd_n, ("programa_f2",i,cmd_n))
+            for i in range(self.rng.randint(2,4)):
+                cmd_s, cmd_n = self.rng.choice(COMANDOS_BASICOS_PALETA)
+                await self.arrastar_para_slot(cmd_s, F2_SLOTS[i], cmd_n, ("programa_f2",i,cmd_n))
 
             # Erro na chamada:
-            if random.random() < 0.4: # Esquece de chamar F2
-                self._log("Confuso: Esqueci de chamar F2 de F1.")
-            elif random.random() < 0.7: # Chama F2 no meio de F1
-                slot_errado_f1 = random.randint(0,3)
-                self._log(f"Confuso: Chamando F2 do slot {slot_errado_f1} de F1.")
-                self.arrastar_para_slot(SELETOR_CMD_F2_PALETA, F1_SLOTS[slot_errado_f1], "Chamar F2",("programa_f1",slot_errado_f1,"Chamar F2"))
+            if self.rng.random() < 0.4: # Esquece de chamar F2
+                self._log("Confuso: Esqueci de chamar F2 de F1.", operacao="persona")
+            elif self.rng.random() < 0.7: # Chama F2 no meio de F1
+                slot_errado_f1 = self.rng.randint(0,3)
+                self._log(f"Confuso: Chamando F2 do slot {slot_errado_f1} de F1.", operacao="persona")
+                await self.arrastar_para_slot(SELETOR_CMD_F2_PALETA, F1_SLOTS[slot_errado_f1], "Chamar F2",("programa_f1",slot_errado_f1,"Chamar F2"))
             else: # Chama F2 corretamente no final de F1
-                self.arrastar_para_slot(SELETOR_CMD_F2_PALETA, F1_SLOTS[7], "Chamar F2",("programa_f1",7,"Chamar F2"))
+                await self.arrastar_para_slot(SELETOR_CMD_F2_PALETA, F1_SLOTS[7], "Chamar F2",("programa_f1",7,"Chamar F2"))
             
-            self.clicar_play_jogo()
-            return self._verificar_sucesso_nivel(tempo_execucao_jogo=15)
-        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR"); return False
+            await self.clicar_play_jogo()
+            return await self._verificar_sucesso_nivel(tempo_execucao_jogo=15)
+        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR", operacao="persona"); return False
 
 class AgenteSuperOtimista(BaseAgent):
-    def __init__(self, page, log_folder):
-        super().__init__(page, "Aluno_Super_Otimista", slow_mo_factor=0.5, max_tentativas=1, log_folder=log_folder)
-    def logica_da_persona_para_tentativa(self):
-        self._log("Super Otimista: Vou tentar em 3 passos!")
+    def __init__(self, page, log_folder, **opcoes):
+        super().__init__(page, "Aluno_Super_Otimista", slow_mo_factor=0.5, max_tentativas=1, log_folder=log_folder, **opcoes)
+    async def logica_da_persona_para_tentativa(self):
+        self._log("Super Otimista: Vou tentar em 3 passos!", operacao="persona")
         # Tenta uma solução muito curta que provavelmente falha
         try:
-            self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[0], "Pega",("programa_f1",0,"Pega"))
-            self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[1], "Direita",("programa_f1",1,"Direita"))
-            self.arrastar_para_slot(SELETOR_CMD_DIREITA, F1_SLOTS[2], "Direita",("programa_f1",2,"Direita"))
-            self.arrastar_para_slot(SELETOR_CMD_BAIXO, F1_SLOTS[3], "Larga",("programa_f1",3,"Larga")) # 4 passos na verdade
-            self.clicar_play_jogo()
-            return self._verificar_sucesso_nivel(tempo_execucao_jogo=8)
-        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR"); return False
+            await self.carregar_programa({"programa_f1": [
+                (SELETOR_CMD_BAIXO, "Pega"), (SELETOR_CMD_DIREITA, "Direita"),
+                (SELETOR_CMD_DIREITA, "Direita"), (SELETOR_CMD_BAIXO, "Larga"), # 4 passos na verdade
+            ]})
+            await self.clicar_play_jogo()
+            return await self._verificar_sucesso_nivel(tempo_execucao_jogo=8)
+        except Exception as e: self._log(f"Erro: {e}", "AGENT_ERROR", operacao="persona"); return False
+
+# --- EXECUÇÃO ISOLADA DE UM AGENTE ---
+OPCOES_NAVEGADOR = {"headless": False, "slow_mo": 100}
+
+def _opcoes_navegador_para(opcoes_agente):
+    # No relógio virtual o ritmo humano só é contabilizado, então o navegador também não é desacelerado
+    opcoes_navegador = {**OPCOES_NAVEGADOR, "headless": os.environ.get("AGENTES_HEADLESS") == "1" or OPCOES_NAVEGADOR["headless"]}
+    if opcoes_agente.get("relogio_virtual"): opcoes_navegador["slow_mo"] = 0
+    return opcoes_navegador
+
+_playwright_do_worker = None
+_navegador_do_worker = None
+_pool_do_worker = None
+_finalizacao_registrada = False
+
+# --- POOL DE PÁGINAS JÁ NO NÍVEL ---
+class PoolDePaginas:
+    # Páginas pré-navegadas até o nível alvo, com registros vazios. Um agente pega uma emprestada e a devolve;
+    # na devolução o storage volta ao instantâneo capturado e os registros são limpos por script, sem passar pela UI.
+    # Serve aos dois backends (browser síncrono ou async); quem usa limita os agentes simultâneos ao tamanho do pool.
+    def __init__(self, browser, espelho=None, seletor_nivel=SELETOR_NIVEL_ALVO):
+        self.browser = browser
+        self.espelho = espelho
+        self.seletor_nivel = seletor_nivel
+        self.Pagina = _classe_de_pagina(browser)
+        self._estado_inicial = {} # página -> storage capturado quando ela ficou pronta
+        self._livres = collections.deque()
+
+    async def abastecer(self, tamanho):
+        novas = [self._nova_pagina() for _ in range(tamanho)]
+        if self.Pagina is PaginaAsync: self._livres.extend(await asyncio.gather(*novas)) # Preparadas juntas no event loop
+        else: self._livres.extend([await nova for nova in novas])
+
+    async def _nova_pagina(self):
+        pagina = await self.Pagina.abrir(self.browser, self.espelho)
+        await self._preparar(pagina)
+        return pagina
+
+    async def _preparar(self, pagina):
+        await pagina.ir_para(CARGOBOT_BASE_URL)
+        await pagina.clicar(SELETOR_START_THE_GAME, 15000)
+        await pagina.clicar(SELETOR_PACOTE_EASY, 15000)
+        await pagina.clicar(self.seletor_nivel, 15000)
+        await pagina.esperar_visivel(F1_SLOTS[0], 15000)
+        await pagina.avaliar(SCRIPT_RESET_EM_PAGINA, _args_reset_em_pagina(None))
+        pagina.slots_vazios = await pagina.avaliar(SCRIPT_CONTEUDO_SLOTS, TODOS_SLOTS) # Referência dos resets seguintes
+        self._estado_inicial[pagina] = await pagina.avaliar(SCRIPT_CAPTURAR_STORAGE)
+
+    def emprestar(self):
+        if not self._livres: raise RuntimeError("PoolDePaginas sem página livre: mais agentes simultâneos que páginas")
+        return self._livres.popleft()
+
+    async def devolver(self, pagina):
+        try:
+            await pagina.avaliar(SCRIPT_RESTAURAR_STORAGE, self._estado_inicial[pagina])
+            # Fora do nível, com comandos que sobraram nos registros ou com tela de sucesso/batida por cima: refaz o caminho até o nível
+            if await pagina.avaliar(SCRIPT_RESET_EM_PAGINA, _args_reset_em_pagina(pagina.slots_vazios)) != "ok": await self._preparar(pagina)
+        except Exception: # Página quebrada ou fechada: troca por uma nova
+            self._estado_inicial.pop(pagina, None)
+            with contextlib.suppress(Exception): await pagina.fechar()
+            pagina = await self._nova_pagina()
+        self._livres.append(pagina)
+
+    async def fechar(self):
+        for pagina in list(self._estado_inicial):
+            with contextlib.suppress(Exception): await pagina.fechar()
+        self._estado_inicial.clear()
+
+# Um agente do começo ao fim; no caminho síncrono são levados até o fim por _rodar_sincrono
+async def _executar_agente_com_pool(pool, AgenteClasse, log_folder, opcoes_agente=None):
+    pagina = pool.emprestar()
+    try:
+        agente = AgenteClasse(pagina, log_folder=log_folder, pagina_no_nivel=True, reset_em_pagina=True, **(opcoes_agente or {}))
+        await agente.executar()
+        return agente.metricas_gerais
+    finally:
+        await pool.devolver(pagina)
+
+async def _executar_agente_isolado(browser, AgenteClasse, log_folder, opcoes_agente=None, espelho=None):
+    pagina = await _classe_de_pagina(browser).abrir(browser, espelho)
+    try:
+        agente = AgenteClasse(pagina, log_folder=log_folder, **(opcoes_agente or {}))
+        await agente.executar()
+        return agente.metricas_gerais
+    finally:
+        await pagina.fechar()
+
+def _encerrar_worker_navegador():
+    global _playwright_do_worker, _navegador_do_worker, _pool_do_worker
+    if _pool_do_worker is not None: _rodar_sincrono(_pool_do_worker.fechar())
+    if _navegador_do_worker is not None: _navegador_do_worker.close()
+    if _playwright_do_worker is not None: _playwright_do_worker.stop()
+    _navegador_do_worker, _playwright_do_worker, _pool_do_worker = None, None, None
+
+def _iniciar_worker_navegador(opcoes_navegador, espelho=None, usar_pool=False, seletor_nivel=SELETOR_NIVEL_ALVO):
+    # Roda uma vez por processo do pool: um Chromium por worker, reaproveitado entre agentes
+    global _playwright_do_worker, _navegador_do_worker, _pool_do_worker, _finalizacao_registrada
+    _playwright_do_worker = sync_playwright().start()
+    _navegador_do_worker = _playwright_do_worker.chromium.launch(**opcoes_navegador)
+    if usar_pool:
+        _pool_do_worker = PoolDePaginas(_navegador_do_worker, espelho=espelho, seletor_nivel=seletor_nivel)
+        _rodar_sincrono(_pool_do_worker.abastecer(1))
+    if not _finalizacao_registrada: # Worker da fila sobe o navegador de novo a cada nível: registra uma vez só
+        mp_util.Finalize(None, _encerrar_worker_navegador, exitpriority=10) # atexit não roda nos workers do pool
+        _finalizacao_registrada = True
+
+def _executar_agente_no_worker(AgenteClasse, log_folder, opcoes_agente, espelho):
+    if _pool_do_worker is not None: return _rodar_sincrono(_executar_agente_com_pool(_pool_do_worker, AgenteClasse, log_folder, opcoes_agente))
+    return _rodar_sincrono(_executar_agente_isolado(_navegador_do_worker, AgenteClasse, log_folder, opcoes_agente, espelho))
+
+def _resultado_de_falha(AgenteClasse, erro):
+    return {"nome_agente": AgenteClasse.__name__, "nivel_resolvido_final": False, "erro_execucao": repr(erro)}
 
 # --- FUNÇÃO PRINCIPAL PARA RODAR OS TESTES ---
-def rodar_agentes_para_usabilidade(lista_de_agentes_classes):
-    all_results_summary = []
-    log_folder_base = "agent_run_logs" 
+def _criar_pasta_da_execucao(log_folder_base="agent_run_logs"):
     if not os.path.exists(log_folder_base): os.makedirs(log_folder_base)
     execution_timestamp = time.strftime("%Y%m%d-%H%M%S")
     current_execution_log_folder = os.path.join(log_folder_base, execution_timestamp)
     if not os.path.exists(current_execution_log_folder): os.makedirs(current_execution_log_folder)
     print(f"Logs desta execução serão salvos em: {current_execution_log_folder}")
+    return current_execution_log_folder
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=100) 
-        for i, AgenteClasse in enumerate(lista_de_agentes_classes):
-            print(f"\n\n--- INICIANDO TESTE COM AGENTE TIPO: {AgenteClasse.__name__} ---")
-            page = browser.new_page()
-            agente = AgenteClasse(page, log_folder=current_execution_log_folder) 
-            agente.run() 
-            all_results_summary.append(agente.metricas_gerais) 
-            print(f"--- TESTE COM AGENTE {AgenteClasse.__name__} CONCLUÍDO ---")
-            page.close() 
-            if i < len(lista_de_agentes_classes) - 1:
-                print("Pausa de 3s antes do próximo agente...")
-                time.sleep(3)
-        browser.close() 
+def _imprimir_resumo_da_execucao(all_results_summary, current_execution_log_folder):
     print("\n\n--- TODOS OS TESTES DE USABILIDADE SIMULADOS CONCLUÍDOS ---")
     print(f"Logs detalhados de cada agente foram salvos na pasta: {current_execution_log_folder}")
     print("\n--- RESUMO DAS MÉTRICAS GERAIS POR AGENTE ---")
     for resultado_agente in all_results_summary:
         print(f"\nAgente: {resultado_agente['nome_agente']}")
         for chave, valor in resultado_agente.items():
-            if chave not in ["nome_agente", "tempo_total_inicio", "tempo_total_fim"]: 
+            if chave not in ["nome_agente", "tempo_total_inicio", "tempo_total_fim", "latencias"]: 
                  print(f"  {chave}: {valor}")
+    _imprimir_latencias_da_execucao(all_results_summary, current_execution_log_folder)
+
+def _imprimir_latencias_da_execucao(all_results_summary, current_execution_log_folder):
+    # Só aparece quando os agentes rodaram com medir_latencias=True
+    com_latencias = [r for r in all_results_summary if r.get("latencias")]
+    if not com_latencias: return
+    print("\n--- LATÊNCIAS POR OPERAÇÃO (p50/p95 = limite da faixa do histograma) ---")
+    for resultado_agente in com_latencias:
+        print(f"\nAgente: {resultado_agente['nome_agente']} (duração {resultado_agente.get('duracao_total_s')}s)")
+        for linha in linhas_do_relatorio(somar_latencias([resultado_agente["latencias"]]), resultado_agente.get("duracao_total_s")): print(linha)
+    duracao_somada = sum(r.get("duracao_total_s") or 0 for r in com_latencias)
+    histogramas_execucao = somar_latencias([r["latencias"] for r in com_latencias])
+    print(f"\nExecução inteira ({len(com_latencias)} agentes, {duracao_somada:.2f}s somados)")
+    for linha in linhas_do_relatorio(histogramas_execucao, duracao_somada): print(linha)
+    resumo = {operacao: {"n": h.n, "p50_s": round(h.percentil(50), 4), "p95_s": round(h.percentil(95), 4),
+                             "max_s": round(h.max_s, 4), "total_s": round(h.total_s, 4)}
+              for operacao, h in histogramas_execucao.items()}
+    with open(os.path.join(current_execution_log_folder, "latencias_execucao.json"), "w", encoding="utf-8") as f: json.dump(resumo, f, indent=2)
+
+def _trabalhos_da_lista(lista_de_agentes, log_folder, opcoes_agente):
+    # Cada item é uma persona ou (persona, opcoes_proprias): opções só daquele agente (ex.: semente, log_folder)
+    # por cima das comuns. Devolve [(AgenteClasse, pasta_de_log, opcoes), ...] na ordem da lista.
+    trabalhos = []
+    for item in lista_de_agentes:
+        AgenteClasse, opcoes_proprias = item if isinstance(item, tuple) else (item, {})
+        opcoes = {**opcoes_agente, **opcoes_proprias}
+        trabalhos.append((AgenteClasse, opcoes.pop("log_folder", log_folder), opcoes))
+    return trabalhos
+
+def _opcoes_agente_do_ambiente():
+    opcoes = {"relogio_virtual": os.environ.get("AGENTES_RELOGIO_VIRTUAL") == "1",
+              "carga_rapida": os.environ.get("AGENTES_CARGA_RAPIDA") == "1",
+              "medir_latencias": os.environ.get("AGENTES_LATENCIAS") == "1",
+              "cache_desfechos": os.environ.get("AGENTES_CACHE")}
+    # Só quando definida: sem ela vale o padrão de quem roda (BaseAgent imprime tudo, o lote Monte Carlo fica em silêncio)
+    if os.environ.get("AGENTES_VERBOSIDADE"): opcoes["verbosidade_console"] = int(os.environ["AGENTES_VERBOSIDADE"])
+    return opcoes
+
+def rodar_agentes(lista_de_agentes_classes, current_execution_log_folder, num_workers=1, opcoes_agente=None, espelho=None, usar_pool=False):
+    # opcoes_agente é repassado ao construtor de cada persona (ex.: {"relogio_virtual": True, "semente": 42});
+    # um item (AgenteClasse, opcoes) da lista acrescenta opções só daquele agente (ver _trabalhos_da_lista)
+    # espelho (EspelhoCargoBot, ou o JogoLocal dos benchmarks) serve o site sem depender da rede
+    # usar_pool reaproveita páginas já no nível entre agentes (PoolDePaginas) em vez de navegar a cada agente
+    opcoes_agente = opcoes_agente or {}
+    trabalhos = _trabalhos_da_lista(lista_de_agentes_classes, current_execution_log_folder, opcoes_agente)
+    all_results_summary = []
+    if num_workers <= 1:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(**_opcoes_navegador_para(opcoes_agente)) 
+            pool = PoolDePaginas(browser, espelho=espelho, seletor_nivel=opcoes_agente.get("seletor_nivel", SELETOR_NIVEL_ALVO)) if usar_pool else None
+            if pool is not None: _rodar_sincrono(pool.abastecer(1))
+            for AgenteClasse, pasta, opcoes in trabalhos:
+                print(f"\n\n--- INICIANDO TESTE COM AGENTE TIPO: {AgenteClasse.__name__} ---")
+                try:
+                    if pool is not None: all_results_summary.append(_rodar_sincrono(_executar_agente_com_pool(pool, AgenteClasse, pasta, opcoes)))
+                    else: all_results_summary.append(_rodar_sincrono(_executar_agente_isolado(browser, AgenteClasse, pasta, opcoes, espelho)))
+                except Exception as e_agente:
+                    print(f"!!! FALHA AO EXECUTAR {AgenteClasse.__name__}: {e_agente}")
+                    all_results_summary.append(_resultado_de_falha(AgenteClasse, e_agente))
+                print(f"--- TESTE COM AGENTE {AgenteClasse.__name__} CONCLUÍDO ---")
+            browser.close() 
+    else:
+        print(f"Rodando {len(trabalhos)} agentes em {num_workers} processos paralelos...")
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_iniciar_worker_navegador, initargs=(_opcoes_navegador_para(opcoes_agente), espelho, usar_pool, opcoes_agente.get("seletor_nivel", SELETOR_NIVEL_ALVO))) as pool:
+            futuros = [pool.submit(_executar_agente_no_worker, AgenteClasse, pasta, opcoes, espelho) for AgenteClasse, pasta, opcoes in trabalhos]
+            for (AgenteClasse, _, _), futuro in zip(trabalhos, futuros): # Mantém a ordem da lista no resumo
+                try: all_results_summary.append(futuro.result())
+                except Exception as e_agente:
+                    print(f"!!! FALHA AO EXECUTAR {AgenteClasse.__name__}: {e_agente}")
+                    all_results_summary.append(_resultado_de_falha(AgenteClasse, e_agente))
+                print(f"--- TESTE COM AGENTE {AgenteClasse.__name__} CONCLUÍDO ---")
+    return all_results_summary
+
+def rodar_agentes_para_usabilidade(lista_de_agentes_classes, num_workers=1, opcoes_agente=None, espelho=None, usar_pool=False):
+    current_execution_log_folder = _criar_pasta_da_execucao()
+    all_results_summary = rodar_agentes(lista_de_agentes_classes, current_execution_log_folder, num_workers, opcoes_agente, espelho, usar_pool)
+    _imprimir_resumo_da_execucao(all_results_summary, current_execution_log_folder)
 
 if __name__ == "__main__":
+    from espelho_cargobot import espelho_do_ambiente
     agentes_a_testar = [
         AgenteSolucionadorPerfeito,     
         AgenteInicianteExplorador,
@@ -368,4 +915,6 @@ if __name__ == "__main__":
         AgenteConfusoComChamadas,
         AgenteSuperOtimista,
     ]
-    rodar_agentes_para_usabilidade(agentes_a_testar)
\ No newline at end of file
+    rodar_agentes_para_usabilidade(agentes_a_testar, num_workers=int(os.environ.get("AGENTES_WORKERS", "1")),
+                                   opcoes_agente=_opcoes_agente_do_ambiente(), espelho=espelho_do_ambiente(),
+                                   usar_pool=os.environ.get("AGENTES_POOL") == "1")
\ No newline at end of file